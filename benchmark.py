@@ -0,0 +1,434 @@
+# benchmark.py
+"""
+Reproducible timings for the parse -> store -> export pipeline.
+Everything runs against throwaway databases and PDFs in a temp directory,
+never automateagent.db.
+
+    python benchmark.py                                # full run, JSON on stdout
+    python benchmark.py --quick -o new.json            # smaller sizes, JSON to a file
+    python benchmark.py -o new.json --compare old.json
+    python benchmark.py --quick --scrape 40             # also time lookups against the local stub site
+
+With --compare, every timing also present in the baseline is printed side by
+side and the exit status is 1 if any got slower than --threshold allows.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+import fitz  # PyMuPDF
+import db
+import excel_writer
+import pdf_parser
+from owner_matcher import find_owners
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Test Data")
+
+DEFAULT_ROW_COUNTS = [10000, 100000, 1000000]
+DEFAULT_SYNTHETIC_PAGES = 2000
+# Exports past this many rows take minutes; larger databases skip the Excel step
+DEFAULT_EXCEL_MAX_ROWS = 100000
+# Rows inserted per insert_records() call, like one parsed report
+ROWS_PER_PDF = 1000
+# Differences smaller than this are timer noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.001
+
+# The owner pattern pdf_parser used before owner_matcher, kept to measure against
+LEGACY_OWNER_PATTERN = re.compile(r"(\d+)\s+(\d+)\s+([A-Z\s]+?)\s+(\d{13})")
+
+SURNAMES = ["MOTHA", "VENTER", "NKOSI", "BEZUIDENHOUT", "PHAKATHI", "VAN RENSBURG", "DLAMINI", "SMITH", "MARAIS", "NAIDOO"]
+FIRST_NAMES = ["CATHERINE", "ANTONIE", "NELLY", "WYNAND", "SIZAKELE", "HENDRIK", "THANDI", "JOHN", "ELIZABETH", "PRIYA"]
+
+def _log(message: str):
+    print(message, file=sys.stderr)
+
+def _random_id(rng: random.Random) -> str:
+    return f"{rng.randint(40, 99):02d}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}{rng.randint(0, 9999999):07d}"
+
+DISCLAIMER = ("Please note that Lightstone obtains data from a broad range of 3rd party sources and "
+              "despite the application of rigorous data checks cannot guarantee its accuracy. ") * 6
+
+def _insert_paragraph(page, text: str, y: float, width: int = 110):
+    for start in range(0, len(text), width):
+        page.insert_text((20, y), text[start:start + width], fontsize=7)
+        y += 10
+    return y
+
+def make_synthetic_report(path: str, pages: int, seed: int = 0, extra_pages: int = 0) -> int:
+    """
+    Writes a Lightstone-style owners report: the scheme details block on page
+    1, the UNIT/SIZE/NAME/IDENTIFIER header on every page and owner rows in
+    the same column positions as the real reports. Every tenth unit has two
+    owners (split into separate name and ID blocks, as in the real PDFs) and
+    every seventh is owned by a company with a 12-digit registration number.
+    extra_pages adds pages without owners, half as cover/map pages before
+    the table and half as Size Summary and disclaimer pages after it.
+    Returns the number of 13-digit owner IDs written.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(extra_pages // 2):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((38, 194), "Sectional Scheme Details", fontsize=11)
+        page.insert_text((20, 234), f"{rng.randint(1, 999)} Braam Street, BENCHMARK EXT 1", fontsize=9)
+        page.draw_rect(fitz.Rect(20, 260, 575, 800), color=(0.2, 0.4, 0.8), fill=(0.9, 0.9, 0.9))
+    unit = 0
+    owner_ids = 0
+    for page_num in range(pages):
+        page = doc.new_page(width=595, height=842)
+        y = 60
+        if page_num == 0:
+            for x, label, value in [(12, "MUNICIPALITY", "City of Tshwane"), (204, "SECTIONAL SCHEME NAME", "SS SYNTHETIC")]:
+                page.insert_text((x, 267), label, fontsize=5)
+                page.insert_text((x, 280), value, fontsize=8)
+            page.insert_text((12, 291), "TOWNSHIP", fontsize=5)
+            page.insert_text((12, 304), "BENCHMARK EXT 1", fontsize=8)
+            page.insert_text((12, 397), "Owner Details", fontsize=11)
+            y = 431
+        for x, header in [(0, "UNIT"), (151, "SIZE"), (302, "NAME"), (453, "IDENTIFIER")]:
+            page.insert_text((x, y), header, fontsize=5)
+        y += 30
+        while y < 790:
+            unit += 1
+            page.insert_text((3, y), str(unit), fontsize=8)
+            page.insert_text((152, y), str(rng.randint(40, 150)), fontsize=8)
+            if unit % 10 == 0:
+                for offset in (-6, 6):
+                    page.insert_text((302, y + offset), f"{rng.choice(SURNAMES)} {rng.choice(FIRST_NAMES)}", fontsize=8)
+                    page.insert_text((451, y + offset), _random_id(rng), fontsize=8)
+                owner_ids += 2
+            elif unit % 7 == 0:
+                page.insert_text((302, y), f"{unit} {rng.choice(SURNAMES)} PROPS CC", fontsize=8)
+                page.insert_text((451, y), f"{rng.randint(1990, 2020)}{rng.randint(0, 99999999):08d}", fontsize=8)
+            else:
+                page.insert_text((302, y), f"{rng.choice(SURNAMES)} {rng.choice(FIRST_NAMES)}", fontsize=8)
+                page.insert_text((451, y), _random_id(rng), fontsize=8)
+                owner_ids += 1
+            y += 25
+        page.insert_text((270, 818), f"Page {page_num + 1} of {pages}", fontsize=6)
+    for page_num in range(extra_pages - extra_pages // 2):
+        page = doc.new_page(width=595, height=842)
+        y = 60
+        if page_num == 0:
+            page.insert_text((20, y), "Size Summary", fontsize=11)
+            for label in ("0-50 M", "51-100 M", "101-200 M", "201+ M"):
+                y += 14
+                page.insert_text((20, y), f"{label}    {rng.randint(0, 300)}", fontsize=8)
+            y += 20
+        page.insert_text((20, y), "Disclaimer", fontsize=11)
+        _insert_paragraph(page, DISCLAIMER, y + 16)
+    doc.save(path)
+    doc.close()
+    return owner_ids
+
+def _timeit(fn: Callable, repeat: int) -> Dict:
+    """
+    One untimed warm-up call, then fn repeat times; "seconds" is the fastest
+    run, which is the most stable to compare.
+    """
+    value = fn()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        runs.append(time.perf_counter() - start)
+    return {"seconds": min(runs), "median_seconds": statistics.median(runs), "runs": repeat, "value": value}
+
+def bench_parse(pdf_paths: List[str], repeat: int) -> Dict[str, Dict]:
+    results = {}
+    for pdf_path in pdf_paths:
+        with fitz.open(pdf_path) as doc:
+            pages = doc.page_count
+        for workers in (1, None):
+            name = f"parse/{os.path.basename(pdf_path)}/workers={workers or 'cpu'}"
+            _log(f"  {name}")
+            try:
+                timing = _timeit(lambda: len(pdf_parser.extract_data_from_pdf(pdf_path, workers=workers, use_cache=False)), repeat)
+            except Exception as e:
+                results[name] = {"error": str(e)}
+                continue
+            timing["records"] = timing.pop("value")
+            timing["pages"] = pages
+            timing["pages_per_second"] = pages / timing["seconds"] if timing["seconds"] else None
+            results[name] = timing
+        # Same report read by word position; records shows how many more owners it finds
+        name = f"parse/{os.path.basename(pdf_path)}/words"
+        _log(f"  {name}")
+        try:
+            timing = _timeit(lambda: len(pdf_parser.extract_data_from_pdf(pdf_path, format_type="lightstone_words", use_cache=False)), repeat)
+            timing["records"] = timing.pop("value")
+            timing["pages"] = pages
+            timing["pages_per_second"] = pages / timing["seconds"] if timing["seconds"] else None
+            results[name] = timing
+        except Exception as e:
+            results[name] = {"error": str(e)}
+        # Re-parse of a known report: only the pages the page index recorded are read
+        name = f"parse/{os.path.basename(pdf_path)}/page_index"
+        _log(f"  {name}")
+        parser = pdf_parser.LightstonePDFParser(workers=1, use_page_index=True)
+        try:
+            timing = _timeit(lambda: len(parser.extract_data(pdf_path)), repeat)
+        except Exception as e:
+            results[name] = {"error": str(e)}
+            continue
+        timing["records"] = timing.pop("value")
+        timing["pages"] = pages
+        results[name] = timing
+    return results
+
+def bench_owner_matching(pdf_paths: List[str], repeat: int) -> Dict[str, Dict]:
+    """
+    Per-block cost of finding owner rows, legacy pattern vs owner_matcher,
+    over every text block of the given reports (the real ones, where most
+    blocks are headers, addresses and disclaimers). Also checks both find
+    the same rows.
+    """
+    blocks = []
+    for pdf_path in pdf_paths:
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                blocks.extend(block[4].strip() for block in page.get_text("blocks"))
+    legacy = lambda: [[(u, s, n.strip(), i) for u, s, n, i in LEGACY_OWNER_PATTERN.findall(text)] for text in blocks]
+    current = lambda: [find_owners(text) for text in blocks]
+    results = {}
+    for name, fn in (("legacy_pattern", legacy), ("owner_matcher", current)):
+        _log(f"  match/{name}")
+        timing = _timeit(fn, repeat)
+        timing.pop("value")
+        timing["blocks"] = len(blocks)
+        timing["us_per_block"] = timing["seconds"] / len(blocks) * 1e6 if blocks else None
+        results[f"match/{name}"] = timing
+    results["match/owner_matcher"]["same_matches_as_legacy"] = legacy() == current()
+    if results["match/owner_matcher"]["seconds"]:
+        results["match/owner_matcher"]["speedup"] = results["match/legacy_pattern"]["seconds"] / results["match/owner_matcher"]["seconds"]
+    return results
+
+def _synthetic_records(count: int, seed: int = 0):
+    """Yields (pdf_filename, records) chunks of ROWS_PER_PDF rows."""
+    rng = random.Random(seed)
+    for start in range(0, count, ROWS_PER_PDF):
+        records = [
+            {
+                "municipality": "City of Tshwane",
+                "township": "BENCHMARK EXT 1",
+                "sectional_scheme_name": "SS SYNTHETIC",
+                "unit": str(unit),
+                "size": str(rng.randint(40, 150)),
+                "name": f"{rng.choice(SURNAMES)} {rng.choice(FIRST_NAMES)}",
+                "identifier": _random_id(rng),
+            }
+            for unit in range(start, min(start + ROWS_PER_PDF, count))
+        ]
+        yield f"synthetic_{start // ROWS_PER_PDF:05d}.pdf", records
+
+def bench_db(rows: int, work_dir: str, repeat: int, excel_max_rows: int) -> Dict[str, Dict]:
+    results = {}
+    db.DB_PATH = os.path.join(work_dir, f"bench_{rows}.db")
+    db.init_db()
+
+    _log(f"  db/insert_records/{rows}")
+    start = time.perf_counter()
+    for pdf_filename, records in _synthetic_records(rows):
+        db.insert_records(pdf_filename, records)
+    seconds = time.perf_counter() - start
+    results[f"db/insert_records/{rows}"] = {"seconds": seconds, "runs": 1, "rows_per_second": rows / seconds}
+
+    # Queries against one report in the middle of the table
+    pdf_filename = f"synthetic_{(rows // ROWS_PER_PDF) // 2:05d}.pdf"
+    pending = db.get_pending_ids(pdf_filename)
+    identifiers = [rec["identifier"] for rec in pending]
+    db.store_lookups({identifier: ["0820000000"] for identifier in identifiers})
+    queries = {
+        "get_pending_ids": lambda: len(db.get_pending_ids(pdf_filename)),
+        "count_records": lambda: db.count_records(pdf_filename),
+        "get_records_page": lambda: len(db.get_records_page(pdf_filename, 200, len(pending) // 2)),
+        "get_cached_lookups": lambda: len(db.get_cached_lookups(identifiers)),
+        "get_pdf_filenames": lambda: len(db.get_pdf_filenames()),
+    }
+    for query, fn in queries.items():
+        name = f"db/{query}/{rows}"
+        _log(f"  {name}")
+        timing = _timeit(fn, repeat)
+        timing.pop("value")
+        results[name] = timing
+
+    name = f"db/update_statuses/{rows}"
+    _log(f"  {name}")
+    start = time.perf_counter()
+    db.update_statuses([(rec["id"], "done") for rec in pending])
+    seconds = time.perf_counter() - start
+    results[name] = {"seconds": seconds, "runs": 1, "rows_per_second": len(pending) / seconds if seconds else None}
+
+    if rows <= excel_max_rows:
+        name = f"excel/export_records/{rows}"
+        _log(f"  {name}")
+        output_path = os.path.join(work_dir, f"bench_{rows}.xlsx")
+        start = time.perf_counter()
+        written = excel_writer.export_records(output_path, status=None)
+        seconds = time.perf_counter() - start
+        results[name] = {"seconds": seconds, "runs": 1, "rows": written, "rows_per_second": written / seconds}
+    db.close_conn()
+    return results
+
+def bench_scrape(id_count: int, work_dir: str) -> Dict[str, Dict]:
+    """
+    Looks up id_count made-up IDs on the local stub site (stub_virtual_agent)
+    with request blocking on and off. Needs Playwright's Chromium.
+    """
+    import stub_virtual_agent
+    import virtual_agent_scraper
+    results = {}
+    db.DB_PATH = os.path.join(work_dir, "scrape.db")
+    db.init_db()
+    rng = random.Random(0)
+    ids = [_random_id(rng) for _ in range(id_count)]
+    session_key = f"benchmark_{os.getpid()}"
+    blocked_hosts = virtual_agent_scraper.BLOCKED_HOSTS
+    server = stub_virtual_agent.serve()
+    try:
+        for label, block in (("unblocked", False), ("blocked", True)):
+            name = f"scrape/{label}/{id_count}"
+            _log(f"  {name}")
+            virtual_agent_scraper.BLOCK_REQUESTS = block
+            # The stub's "third-party" analytics script is served from localhost
+            virtual_agent_scraper.BLOCKED_HOSTS = blocked_hosts + ("localhost",)
+            # Sign in first so both runs time lookups only
+            virtual_agent_scraper.scrape_phones_for_ids(
+                ids[:1], "bench", "bench", base_url=f"http://127.0.0.1:{server.server_port}",
+                session_key=session_key, cache_ttl_days=None
+            )
+            stub_virtual_agent.StubHandler.bytes_served = 0
+            stub_virtual_agent.StubHandler.requests_served = {}
+            start = time.perf_counter()
+            virtual_agent_scraper.scrape_phones_for_ids(
+                ids, "bench", "bench", concurrency=1, rate_per_second=0,
+                base_url=f"http://127.0.0.1:{server.server_port}", session_key=session_key, cache_ttl_days=None
+            )
+            seconds = time.perf_counter() - start
+            results[name] = {
+                "seconds": seconds,
+                "runs": 1,
+                "ms_per_id": seconds * 1000.0 / id_count,
+                "bytes_served": stub_virtual_agent.StubHandler.bytes_served,
+                "requests_served": sum(stub_virtual_agent.StubHandler.requests_served.values()),
+            }
+    finally:
+        server.shutdown()
+        virtual_agent_scraper.BLOCK_REQUESTS = True
+        virtual_agent_scraper.BLOCKED_HOSTS = blocked_hosts
+        try:
+            os.remove(virtual_agent_scraper.session_path(session_key))
+        except OSError:
+            pass
+        db.close_conn()
+    return results
+
+def _environment() -> Dict[str, str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": str(os.cpu_count()),
+        "pymupdf": getattr(fitz, "VersionBind", ""),
+    }
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Prints each timing against the baseline; returns the names that regressed."""
+    regressions = []
+    for name, result in current["results"].items():
+        old = baseline.get("results", {}).get(name, {})
+        if not result.get("seconds") or not old.get("seconds"):
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        flag = ""
+        if ratio > 1 + threshold and result["seconds"] - old["seconds"] > MIN_REGRESSION_SECONDS:
+            regressions.append(name)
+            flag = "  <-- slower"
+        print(f"{name:60} {old['seconds']:10.4f}s -> {result['seconds']:10.4f}s  {ratio:5.2f}x{flag}")
+    return regressions
+
+def run(row_counts: List[int], synthetic_pages: int, repeat: int, excel_max_rows: int, scrape_ids: int = 0) -> Dict:
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="aegis_bench_")
+    original_db_path = db.DB_PATH
+    try:
+        db.DB_PATH = os.path.join(work_dir, "parse.db")
+        db.init_db()
+        pdf_paths = sorted(
+            os.path.join(TEST_DATA_DIR, name) for name in os.listdir(TEST_DATA_DIR) if name.lower().endswith(".pdf")
+        ) if os.path.isdir(TEST_DATA_DIR) else []
+        if synthetic_pages:
+            synthetic_path = os.path.join(work_dir, f"synthetic_{synthetic_pages}_pages.pdf")
+            _log(f"Generating {synthetic_pages}-page synthetic report...")
+            expected = make_synthetic_report(synthetic_path, synthetic_pages, extra_pages=synthetic_pages // 4)
+            results[f"synthetic/{synthetic_pages}_pages"] = {"owner_ids": expected}
+            pdf_paths.append(synthetic_path)
+        _log("Matching owner rows...")
+        results.update(bench_owner_matching([path for path in pdf_paths if path.startswith(TEST_DATA_DIR)], max(repeat, 20)))
+        _log("Parsing...")
+        results.update(bench_parse(pdf_paths, repeat))
+        for rows in row_counts:
+            _log(f"Database with {rows} rows...")
+            results.update(bench_db(rows, work_dir, repeat, excel_max_rows))
+        if scrape_ids:
+            _log(f"Looking up {scrape_ids} IDs on the stub site...")
+            results.update(bench_scrape(scrape_ids, work_dir))
+    finally:
+        db.close_conn()
+        db.DB_PATH = original_db_path
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {"environment": _environment(), "results": results}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parse -> store -> export pipeline.")
+    parser.add_argument("--rows", type=int, nargs="+", default=None, help=f"database sizes (default {DEFAULT_ROW_COUNTS})")
+    parser.add_argument("--pages", type=int, default=None, help=f"pages in the synthetic report, 0 to skip (default {DEFAULT_SYNTHETIC_PAGES})")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per parse/query timing; the fastest is kept")
+    parser.add_argument("--excel-max-rows", type=int, default=DEFAULT_EXCEL_MAX_ROWS)
+    parser.add_argument("--scrape", type=int, default=0, help="IDs to look up on the local stub site, 0 to skip (needs Chromium)")
+    parser.add_argument("--quick", action="store_true", help="10k rows and a 200-page synthetic report")
+    parser.add_argument("-o", "--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before --compare fails (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    row_counts = args.rows or ([10000] if args.quick else DEFAULT_ROW_COUNTS)
+    pages = args.pages if args.pages is not None else (200 if args.quick else DEFAULT_SYNTHETIC_PAGES)
+    report = run(row_counts, pages, args.repeat, args.excel_max_rows, args.scrape)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        _log(f"Results written to {args.output}")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            _log(f"{len(regressions)} timing(s) more than {args.threshold:.0%} slower than {args.compare}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import sqlite3
-from typing import List, Dict, Optional
+import json
+import socket
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'automateagent.db')
 
@@ -21,35 +25,290 @@ CREATE TABLE IF NOT EXISTS processed_ids (
 );
 '''
 
-def get_conn():
-    return sqlite3.connect(DB_PATH)
+PARSE_CACHE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS parse_cache (
+    content_hash TEXT,
+    format_type TEXT,
+    parser_version TEXT,
+    records TEXT,
+    last_used TEXT,
+    PRIMARY KEY (content_hash, format_type)
+);
+'''
+
+# Each entry upgrades the schema by one version (tracked in PRAGMA
+# user_version) and is applied once, in order, by ensure_db().
+MIGRATIONS = [
+    # 1: base tables
+    [SCHEMA, PARSE_CACHE_SCHEMA],
+    # 2: indexes for the per-PDF queries, and one row per owner per unit per PDF.
+    #    Existing duplicates are collapsed first, keeping a 'done' row if there is one.
+    [
+        '''DELETE FROM processed_ids WHERE id NOT IN (
+               SELECT id FROM (
+                   SELECT id, ROW_NUMBER() OVER (
+                       PARTITION BY pdf_filename, identifier, unit
+                       ORDER BY status = 'done' DESC, id
+                   ) AS rn
+                   FROM processed_ids
+               ) WHERE rn = 1
+           )''',
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_processed_ids_owner ON processed_ids (pdf_filename, identifier, unit)',
+        'CREATE INDEX IF NOT EXISTS ix_processed_ids_pdf_status ON processed_ids (pdf_filename, status)',
+        'CREATE INDEX IF NOT EXISTS ix_processed_ids_identifier ON processed_ids (identifier)',
+    ],
+    # 3: phone numbers already looked up, shared by every PDF an ID appears in
+    [
+        '''CREATE TABLE IF NOT EXISTS lookup_cache (
+               identifier TEXT PRIMARY KEY,
+               phone_numbers TEXT,
+               fetched_at TEXT
+           )''',
+    ],
+    # 4: lets the Results page page through one PDF's rows in id order
+    [
+        'CREATE INDEX IF NOT EXISTS ix_processed_ids_pdf_id ON processed_ids (pdf_filename, id)',
+    ],
+    # 5: incremental Excel exports; one high-water mark per output file
+    [
+        '''CREATE TABLE IF NOT EXISTS export_marks (
+               output_path TEXT PRIMARY KEY,
+               last_processed_at TEXT,
+               last_id INTEGER,
+               exported_at TEXT
+           )''',
+        'CREATE INDEX IF NOT EXISTS ix_processed_ids_status_processed_at ON processed_ids (status, processed_at)',
+    ],
+    # 6: per-stage timings written by metrics.py
+    [
+        '''CREATE TABLE IF NOT EXISTS metrics (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               stage TEXT,
+               duration_ms REAL,
+               count INTEGER,
+               ok INTEGER,
+               recorded_at TEXT
+           )''',
+        'CREATE INDEX IF NOT EXISTS ix_metrics_stage_duration ON metrics (stage, duration_ms)',
+        'CREATE INDEX IF NOT EXISTS ix_metrics_recorded_at ON metrics (recorded_at)',
+    ],
+    # 7: which pages of a report hold its owner table, so re-parses skip the rest
+    [
+        '''CREATE TABLE IF NOT EXISTS page_index (
+               content_hash TEXT PRIMARY KEY,
+               classifier_version TEXT,
+               table_pages TEXT,
+               created_at TEXT
+           )''',
+    ],
+    # 8: resumable runs. A run leases the rows it is looking up ('in_progress'
+    #    until lease_expires_at, renewed by its heartbeat) so a crashed run's rows
+    #    can be reclaimed, and files whose records are all stored are not re-parsed.
+    [
+        '''CREATE TABLE IF NOT EXISTS runs (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               agent_name TEXT,
+               pdf_paths TEXT,
+               status TEXT,
+               started_at TEXT,
+               heartbeat_at TEXT,
+               finished_at TEXT,
+               message TEXT
+           )''',
+        '''CREATE TABLE IF NOT EXISTS ingested_files (
+               pdf_filename TEXT,
+               content_hash TEXT,
+               record_count INTEGER,
+               run_id INTEGER,
+               ingested_at TEXT,
+               PRIMARY KEY (pdf_filename, content_hash)
+           )''',
+        'ALTER TABLE processed_ids ADD COLUMN lease_run_id INTEGER',
+        'ALTER TABLE processed_ids ADD COLUMN lease_expires_at TEXT',
+        'CREATE INDEX IF NOT EXISTS ix_runs_status ON runs (status)',
+    ],
+    # 9: the process ("host:pid") each run belongs to, so a crashed run is
+    #    recognised as soon as the app starts again, without waiting out its leases
+    [
+        'ALTER TABLE runs ADD COLUMN owner TEXT',
+    ],
+    # 10: failed lookups per row; a failed row keeps lease_run_id as the run it failed in
+    [
+        'ALTER TABLE processed_ids ADD COLUMN failures INTEGER NOT NULL DEFAULT 0',
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Re-processing a PDF refreshes the owner details but keeps the row (and its status)
+INSERT_SQL = '''INSERT INTO processed_ids (pdf_filename, municipality, township, sectional_scheme_name, unit, size, name, identifier, status, processed_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NULL)
+               ON CONFLICT (pdf_filename, identifier, unit) DO UPDATE SET
+                   municipality=excluded.municipality,
+                   township=excluded.township,
+                   sectional_scheme_name=excluded.sectional_scheme_name,
+                   size=excluded.size,
+                   name=excluded.name'''
+
+# Row states: waiting for a lookup, leased by a running run, numbers found,
+# lookup failed, looked up but nothing listed
+PENDING = 'pending'
+IN_PROGRESS = 'in_progress'
+DONE = 'done'
+FAILED = 'failed'
+NO_RESULT = 'no_result'
+FINISHED_STATUSES = (DONE, FAILED, NO_RESULT)
+
+# A run renews its leases (and heartbeat) well within this; a run silent for
+# longer is treated as dead and its rows are handed to the next run
+RUN_LEASE_SECONDS = 60
+
+# Runs a failed row is retried in before it is left as 'failed'
+MAX_ROW_FAILURES = 3
+
+# Most recently used parsed reports kept in parse_cache
+PARSE_CACHE_MAX_ENTRIES = 200
+
+# Looked-up numbers younger than this are reused instead of spending a credit
+LOOKUP_CACHE_TTL_DAYS = 30
+
+# Timings older than this are dropped at startup
+METRICS_RETENTION_DAYS = 90
+
+# Stay well under SQLite's limit on bound parameters per statement
+_MAX_PARAMS = 500
+
+# Applied to every new connection. WAL lets the Results page read while the
+# automation loop writes; synchronous=NORMAL is durable enough under WAL and
+# avoids an fsync per commit.
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-16000',      # ~16 MB page cache
+    'PRAGMA mmap_size=268435456',    # 256 MB memory-mapped reads
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+_local = threading.local()
+# One writer at a time within this process; readers never take it
+_write_lock = threading.RLock()
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5.0)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_conn() -> sqlite3.Connection:
+    """
+    Returns this thread's connection to DB_PATH, opening it on first use.
+    Connections are reused for the life of the thread instead of being
+    opened per query.
+    """
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(DB_PATH)
+    if conn is None:
+        conn = conns[DB_PATH] = _connect(DB_PATH)
+    return conn
+
+def close_conn():
+    """Closes the calling thread's connections (e.g. when a worker finishes)."""
+    for conn in getattr(_local, 'conns', {}).values():
+        conn.close()
+    _local.conns = {}
+
+@contextmanager
+def transaction():
+    """
+    Write transaction on this thread's connection, committed on exit and
+    rolled back on error. Writers in this process are serialized so they
+    never race each other for the database write lock.
+    """
+    conn = get_conn()
+    with _write_lock:
+        with conn:
+            yield conn
 
 def init_db():
-    with get_conn() as conn:
-        conn.execute(SCHEMA)
-        conn.commit()
+    """Brings the database up to SCHEMA_VERSION, one migration per transaction."""
+    conn = get_conn()
+    with _write_lock:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for statement in MIGRATIONS[target - 1]:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {target}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
 
 def insert_record(pdf_filename: str, municipality: str, township: str, sectional_scheme_name: str, unit: str, size: str, name: str, identifier: str, status: str = 'pending'):
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute(
-            '''INSERT INTO processed_ids (pdf_filename, municipality, township, sectional_scheme_name, unit, size, name, identifier, status, processed_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NULL)''',
+            INSERT_SQL,
             (pdf_filename, municipality, township, sectional_scheme_name, unit, size, name, identifier, status)
         )
-        conn.commit()
+
+def insert_records(pdf_filename: str, records: List[Dict], status: str = 'pending') -> int:
+    """
+    Inserts all parsed records for one PDF using a single connection and a
+    single transaction. Owners already stored for this PDF are updated in
+    place rather than duplicated. Returns the number of rows written.
+    """
+    rows = [
+        (
+            pdf_filename,
+            rec.get("municipality", ""),
+            rec.get("township", ""),
+            rec.get("sectional_scheme_name", ""),
+            rec.get("unit", ""),
+            rec.get("size", ""),
+            rec.get("name", ""),
+            rec.get("identifier", ""),
+            status
+        )
+        for rec in records
+    ]
+    with transaction() as conn:
+        conn.executemany(INSERT_SQL, rows)
+    return len(rows)
 
 def update_status(record_id: int, status: str):
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute(
             'UPDATE processed_ids SET status=?, processed_at=? WHERE id=?',
             (status, datetime.now().isoformat() if status == 'done' else None, record_id)
         )
-        conn.commit()
+
+def update_statuses(updates: List[Tuple[int, str]]):
+    """
+    Applies many (record_id, status) updates in one transaction, releasing
+    their leases. A 'failed' row counts the failure and remembers the run it
+    failed in, which does not claim it again.
+    """
+    now = datetime.now().isoformat()
+    with transaction() as conn:
+        conn.executemany(
+            '''UPDATE processed_ids SET status=?, processed_at=?, lease_expires_at=NULL,
+                   lease_run_id=CASE WHEN ? THEN lease_run_id END,
+                   failures=failures + ?
+               WHERE id=?''',
+            [
+                (status, now if status in FINISHED_STATUSES else None, status == FAILED, status == FAILED, record_id)
+                for record_id, status in updates
+            ]
+        )
 
 def get_pending_ids(pdf_filename: str) -> List[Dict]:
     with get_conn() as conn:
         cur = conn.execute(
-            'SELECT * FROM processed_ids WHERE pdf_filename=? AND status="pending"',
+            "SELECT * FROM processed_ids WHERE pdf_filename=? AND status='pending'",
             (pdf_filename,)
         )
         cols = [desc[0] for desc in cur.description]
@@ -58,7 +317,7 @@ def get_pending_ids(pdf_filename: str) -> List[Dict]:
 def get_done_ids(pdf_filename: str) -> List[Dict]:
     with get_conn() as conn:
         cur = conn.execute(
-            'SELECT * FROM processed_ids WHERE pdf_filename=? AND status="done"',
+            "SELECT * FROM processed_ids WHERE pdf_filename=? AND status='done'",
             (pdf_filename,)
         )
         cols = [desc[0] for desc in cur.description]
@@ -73,6 +332,325 @@ def get_all_records(pdf_filename: str) -> List[Dict]:
         cols = [desc[0] for desc in cur.description]
         return [dict(zip(cols, row)) for row in cur.fetchall()]
 
+def get_cached_parse(content_hash: str, format_type: str, parser_version: str) -> Optional[List[Dict]]:
+    row = get_conn().execute(
+        'SELECT records FROM parse_cache WHERE content_hash=? AND format_type=? AND parser_version=?',
+        (content_hash, format_type, parser_version)
+    ).fetchone()
+    if row is None:
+        return None
+    with transaction() as conn:
+        conn.execute(
+            'UPDATE parse_cache SET last_used=? WHERE content_hash=? AND format_type=?',
+            (datetime.now().isoformat(), content_hash, format_type)
+        )
+    return json.loads(row[0])
+
+def store_parse(content_hash: str, format_type: str, parser_version: str, records: List[Dict], max_entries: int = PARSE_CACHE_MAX_ENTRIES):
+    with transaction() as conn:
+        conn.execute(
+            '''INSERT OR REPLACE INTO parse_cache (content_hash, format_type, parser_version, records, last_used)
+               VALUES (?, ?, ?, ?, ?)''',
+            (content_hash, format_type, parser_version, json.dumps(records), datetime.now().isoformat())
+        )
+        # Evict least recently used entries beyond the cap
+        conn.execute(
+            '''DELETE FROM parse_cache WHERE rowid NOT IN (
+                   SELECT rowid FROM parse_cache ORDER BY last_used DESC LIMIT ?
+               )''',
+            (max_entries,)
+        )
+
+def get_page_index(content_hash: str, classifier_version: str) -> Optional[List[List]]:
+    """
+    [page, may_hold_owners, has_details] for the 0-based pages a report's
+    owner table and scheme details were read from, or None if it has not
+    been classified.
+    """
+    row = get_conn().execute(
+        'SELECT table_pages FROM page_index WHERE content_hash=? AND classifier_version=?',
+        (content_hash, classifier_version)
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+def store_page_index(content_hash: str, classifier_version: str, table_pages: List[Tuple[int, bool, bool]]):
+    with transaction() as conn:
+        conn.execute(
+            '''INSERT OR REPLACE INTO page_index (content_hash, classifier_version, table_pages, created_at)
+               VALUES (?, ?, ?, ?)''',
+            (content_hash, classifier_version, json.dumps(table_pages), datetime.now().isoformat())
+        )
+
+def get_cached_lookups(identifiers: List[str], ttl_days: float = LOOKUP_CACHE_TTL_DAYS) -> Dict[str, List[str]]:
+    """Returns {identifier: phone_numbers} for the given IDs fetched within ttl_days."""
+    cutoff = (datetime.now() - timedelta(days=ttl_days)).isoformat()
+    identifiers = list(dict.fromkeys(identifiers))
+    cached = {}
+    conn = get_conn()
+    for start in range(0, len(identifiers), _MAX_PARAMS):
+        chunk = identifiers[start:start + _MAX_PARAMS]
+        cur = conn.execute(
+            f'''SELECT identifier, phone_numbers FROM lookup_cache
+                WHERE fetched_at >= ? AND identifier IN ({",".join("?" * len(chunk))})''',
+            [cutoff] + chunk
+        )
+        for identifier, phone_numbers in cur.fetchall():
+            cached[identifier] = json.loads(phone_numbers)
+    return cached
+
+def store_lookups(results: Dict[str, List[str]]):
+    now = datetime.now().isoformat()
+    with transaction() as conn:
+        conn.executemany(
+            '''INSERT OR REPLACE INTO lookup_cache (identifier, phone_numbers, fetched_at)
+               VALUES (?, ?, ?)''',
+            [(identifier, json.dumps(numbers), now) for identifier, numbers in results.items()]
+        )
+
+def count_records(pdf_filename: str) -> Dict[str, int]:
+    """Returns {status: row_count} for one PDF without loading its rows."""
+    cur = get_conn().execute(
+        'SELECT status, COUNT(*) FROM processed_ids WHERE pdf_filename=? GROUP BY status',
+        (pdf_filename,)
+    )
+    return {status: count for status, count in cur.fetchall()}
+
+def get_records_page(pdf_filename: str, limit: int, offset: int = 0) -> List[Dict]:
+    """One page of a PDF's rows in insertion order, for tables that only show part of the data."""
+    cur = get_conn().execute(
+        'SELECT * FROM processed_ids WHERE pdf_filename=? ORDER BY id LIMIT ? OFFSET ?',
+        (pdf_filename, limit, offset)
+    )
+    cols = [desc[0] for desc in cur.description]
+    return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+def get_export_mark(output_path: str) -> Optional[Tuple[str, int]]:
+    """(processed_at, id) of the last row written to output_path, or None if never exported."""
+    row = get_conn().execute(
+        'SELECT last_processed_at, last_id FROM export_marks WHERE output_path=?',
+        (os.path.abspath(output_path),)
+    ).fetchone()
+    return (row[0], row[1]) if row else None
+
+def set_export_mark(output_path: str, mark: Tuple[str, int]):
+    with transaction() as conn:
+        conn.execute(
+            '''INSERT OR REPLACE INTO export_marks (output_path, last_processed_at, last_id, exported_at)
+               VALUES (?, ?, ?, ?)''',
+            (os.path.abspath(output_path), mark[0], mark[1], datetime.now().isoformat())
+        )
+
+def clear_export_mark(output_path: str):
+    with transaction() as conn:
+        conn.execute('DELETE FROM export_marks WHERE output_path=?', (os.path.abspath(output_path),))
+
+def record_metrics(rows: List[Tuple[str, float, int, int, str]]):
+    """Writes (stage, duration_ms, count, ok, recorded_at) rows in one transaction."""
+    with transaction() as conn:
+        conn.executemany(
+            'INSERT INTO metrics (stage, duration_ms, count, ok, recorded_at) VALUES (?, ?, ?, ?, ?)',
+            rows
+        )
+
+def get_stage_stats(since: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Returns {stage: {samples, items, p50_ms, p95_ms, p99_ms, total_ms}} for
+    metrics recorded since the given ISO timestamp. Percentiles are
+    nearest-rank, ranked per stage with a window function.
+    """
+    cur = get_conn().execute(
+        '''WITH ranked AS (
+               SELECT stage, duration_ms, count,
+                      ROW_NUMBER() OVER (PARTITION BY stage ORDER BY duration_ms) AS rn,
+                      COUNT(*) OVER (PARTITION BY stage) AS n
+               FROM metrics WHERE recorded_at >= ?
+           )
+           SELECT stage, n, SUM(count),
+                  MIN(CASE WHEN rn >= 0.50 * n THEN duration_ms END),
+                  MIN(CASE WHEN rn >= 0.95 * n THEN duration_ms END),
+                  MIN(CASE WHEN rn >= 0.99 * n THEN duration_ms END),
+                  SUM(duration_ms)
+           FROM ranked GROUP BY stage''',
+        (since or '',)
+    )
+    return {
+        stage: {"samples": n, "items": items, "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "total_ms": total}
+        for stage, n, items, p50, p95, p99, total in cur.fetchall()
+    }
+
+def get_run_stats(since: Optional[str] = None) -> Dict:
+    """
+    Totals over automation runs ('run' metrics): successful and failed runs,
+    IDs processed and throughput in IDs per minute of run time.
+    """
+    ok_runs, failed_runs, ids, total_ms = get_conn().execute(
+        '''SELECT COALESCE(SUM(ok), 0), COALESCE(SUM(1 - ok), 0), COALESCE(SUM(count), 0), COALESCE(SUM(duration_ms), 0)
+           FROM metrics WHERE stage = 'run' AND recorded_at >= ?''',
+        (since or '',)
+    ).fetchone()
+    return {
+        "successful_runs": ok_runs,
+        "failed_runs": failed_runs,
+        "ids_processed": ids,
+        "ids_per_minute": ids / (total_ms / 60000.0) if total_ms else 0.0,
+        "avg_run_ms": total_ms / (ok_runs + failed_runs) if ok_runs + failed_runs else 0.0,
+    }
+
+def get_processing_totals() -> Dict[str, int]:
+    pdfs, done = get_conn().execute(
+        "SELECT COUNT(DISTINCT pdf_filename), COUNT(CASE WHEN status='done' THEN 1 END) FROM processed_ids"
+    ).fetchone()
+    return {"pdfs": pdfs, "ids_done": done}
+
+def prune_metrics(retention_days: float = METRICS_RETENTION_DAYS):
+    cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+    with transaction() as conn:
+        conn.execute('DELETE FROM metrics WHERE recorded_at < ?', (cutoff,))
+
+_RELEASE_SQL = """UPDATE processed_ids SET status='pending', lease_run_id=NULL, lease_expires_at=NULL
+                  WHERE lease_run_id=? AND status='in_progress'"""
+
+def _lease_until(lease_seconds: float) -> str:
+    return (datetime.now() + timedelta(seconds=lease_seconds)).isoformat()
+
+def run_owner() -> str:
+    """Identifies this process in runs.owner."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def start_run(agent_name: str, pdf_paths: List[str]) -> int:
+    """Records a new 'running' run owned by this process and returns its id."""
+    now = datetime.now().isoformat()
+    with transaction() as conn:
+        cur = conn.execute(
+            '''INSERT INTO runs (agent_name, pdf_paths, status, started_at, heartbeat_at, owner)
+               VALUES (?, ?, 'running', ?, ?, ?)''',
+            (agent_name, json.dumps(pdf_paths), now, now, run_owner())
+        )
+        return cur.lastrowid
+
+def heartbeat_run(run_id: int, lease_seconds: float = RUN_LEASE_SECONDS):
+    """Marks a run as alive and extends the leases on the rows it holds."""
+    with transaction() as conn:
+        conn.execute('UPDATE runs SET heartbeat_at=? WHERE id=?', (datetime.now().isoformat(), run_id))
+        conn.execute(
+            "UPDATE processed_ids SET lease_expires_at=? WHERE lease_run_id=? AND status='in_progress'",
+            (_lease_until(lease_seconds), run_id)
+        )
+
+def finish_run(run_id: int, status: str, message: str = ''):
+    """Closes a run ('finished', 'failed' or 'cancelled') and hands back any rows it still holds."""
+    with transaction() as conn:
+        conn.execute(_RELEASE_SQL, (run_id,))
+        conn.execute(
+            'UPDATE runs SET status=?, finished_at=?, message=? WHERE id=?',
+            (status, datetime.now().isoformat(), message, run_id)
+        )
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill(pid, 0) would terminate the process on Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _owner_gone(owner: Optional[str]) -> bool:
+    # Only a process on this host can be checked; a foreign owner counts as alive
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit() or int(pid) == os.getpid():
+        return False
+    return not _pid_alive(int(pid))
+
+def recover_stale_runs(lease_seconds: float = RUN_LEASE_SECONDS) -> int:
+    """
+    Called when a job starts. Marks 'running' runs as 'interrupted' when
+    their heartbeat is older than lease_seconds, or when they belong to a
+    process on this host that no longer exists, and returns their
+    in-progress rows (and any other expired lease) to 'pending'. A run
+    another live instance is still heartbeating is left alone. Returns the
+    number of rows reclaimed.
+    """
+    now = datetime.now()
+    cutoff = (now - timedelta(seconds=lease_seconds)).isoformat()
+    now = now.isoformat()
+    with transaction() as conn:
+        running = conn.execute("SELECT id, owner, heartbeat_at FROM runs WHERE status='running'").fetchall()
+        stale = [(now, run_id) for run_id, owner, heartbeat_at in running
+                 if (heartbeat_at or "") < cutoff or _owner_gone(owner)]
+        conn.executemany("UPDATE runs SET status='interrupted', finished_at=? WHERE id=?", stale)
+        cur = conn.execute(
+            '''UPDATE processed_ids SET status='pending', lease_run_id=NULL, lease_expires_at=NULL
+               WHERE status='in_progress' AND (lease_expires_at < ? OR lease_run_id IN (SELECT id FROM runs WHERE status != 'running'))''',
+            (now,)
+        )
+        return cur.rowcount
+
+def claim_records(pdf_filename: str, run_id: int, lease_seconds: float = RUN_LEASE_SECONDS) -> List[Dict]:
+    """
+    Leases one PDF's rows that still need a lookup (pending, failed in an
+    earlier run fewer than MAX_ROW_FAILURES times, or in progress under an
+    expired lease) to run_id and returns every row the run now holds for
+    that PDF.
+    """
+    now = datetime.now().isoformat()
+    with transaction() as conn:
+        conn.execute(
+            '''UPDATE processed_ids SET status='in_progress', lease_run_id=?, lease_expires_at=?
+               WHERE pdf_filename=? AND (
+                   status='pending'
+                   OR (status='failed' AND failures < ? AND COALESCE(lease_run_id, -1) != ?)
+                   OR (status='in_progress' AND lease_expires_at < ?)
+               )''',
+            (run_id, _lease_until(lease_seconds), pdf_filename, MAX_ROW_FAILURES, run_id, now)
+        )
+        cur = conn.execute(
+            "SELECT * FROM processed_ids WHERE pdf_filename=? AND lease_run_id=? AND status='in_progress' ORDER BY id",
+            (pdf_filename, run_id)
+        )
+        cols = [desc[0] for desc in cur.description]
+        return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+def release_records(run_id: int):
+    """Returns rows a run leased but did not finish to 'pending'."""
+    with transaction() as conn:
+        conn.execute(_RELEASE_SQL, (run_id,))
+
+def is_file_ingested(pdf_filename: str, content_hash: str) -> bool:
+    """True once every record of this exact report has been stored under pdf_filename."""
+    row = get_conn().execute(
+        'SELECT 1 FROM ingested_files WHERE pdf_filename=? AND content_hash=?',
+        (pdf_filename, content_hash)
+    ).fetchone()
+    return row is not None
+
+def mark_file_ingested(pdf_filename: str, content_hash: str, record_count: int, run_id: Optional[int] = None):
+    with transaction() as conn:
+        conn.execute(
+            '''INSERT OR REPLACE INTO ingested_files (pdf_filename, content_hash, record_count, run_id, ingested_at)
+               VALUES (?, ?, ?, ?, ?)''',
+            (pdf_filename, content_hash, record_count, run_id, datetime.now().isoformat())
+        )
+
+def get_pdf_filenames() -> List[str]:
+    with get_conn() as conn:
+        cur = conn.execute('SELECT DISTINCT pdf_filename FROM processed_ids ORDER BY pdf_filename')
+        return [row[0] for row in cur.fetchall()]
+
 # Call this at app startup
 def ensure_db():
-    init_db() 
\ No newline at end of file
+    init_db()
+    prune_metrics() 
\ No newline at end of file
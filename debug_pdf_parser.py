@@ -1,22 +1,25 @@
 # debug_pdf_parser.py
 import fitz
-import re
 import db
+from owner_matcher import find_owners
+from pdf_parser import empty_details, read_scheme_details
 
 def debug_extract_owners(pdf_path: str):
     try:
         doc = fitz.open(pdf_path)
         results = []
-        # Pattern: unit (digits), size (digits), name (words + spaces), identifier (13 digits)
-        pattern = re.compile(r"(\d+)\s+(\d+)\s+([A-Z\s]+?)\s+(\d{13})")
+        details = empty_details()
         pdf_filename = pdf_path
         for page_num, page in enumerate(doc):
             print(f"\n--- Page {page_num + 1} ---")
             blocks = page.get_text("blocks")
+            if not any(details.values()):
+                details.update(read_scheme_details(blocks))
+                print(f"[DETAILS] {details}")
             for block in blocks:
                 text = block[4].strip()
                 print(f"[BLOCK TEXT]\n{text}\n---")
-                matches = pattern.findall(text)
+                matches = find_owners(text)
                 for match in matches:
                     unit, size, name, identifier = match
                     print(f"[MATCH] unit: {unit}, size: {size}, name: {name.strip()}, identifier: {identifier}")
@@ -24,22 +27,14 @@ def debug_extract_owners(pdf_path: str):
                         "unit": unit,
                         "size": size,
                         "name": name.strip(),
-                        "identifier": identifier
+                        "identifier": identifier,
+                        **details
                     }
                     results.append(record)
-                    # Save to DB (other fields left blank for demo)
-                    db.insert_record(
-                        pdf_filename=pdf_filename,
-                        municipality="",
-                        township="",
-                        sectional_scheme_name="",
-                        unit=unit,
-                        size=size,
-                        name=name.strip(),
-                        identifier=identifier
-                    )
-                    print(f"[DB] Saved record for identifier: {identifier}")
         doc.close()
+        # Save to DB in one transaction
+        db.insert_records(pdf_filename, results)
+        print(f"[DB] Saved {len(results)} records")
         if results:
             print(f"\n✅ Extracted and saved {len(results)} owner records.")
         else:
@@ -2,16 +2,188 @@
 """
 Handles writing results to an Excel file using openpyxl.
 Exports: write_results_to_excel(results: Dict[str, List[str]], output_path: str)
+         export_records(output_path: str, pdf_filename: Optional[str] = None, status: Optional[str] = "done") -> int
+         export_new_records(output_path: str) -> Tuple[int, str]
 """
-from typing import Dict, List
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+import db
+import metrics
+
+EXPORT_HEADERS = ["PDF", "Municipality", "Township", "Scheme", "Unit", "Name", "ID", "Phone 1", "Phone 2", "Phone 3"]
+MIN_COLUMN_WIDTH = 10
+MAX_COLUMN_WIDTH = 40
+REPORT_SHEET = "Aegis Report"
+PHONE_WIDTH = 10  # normalized numbers are always 0XXXXXXXXX
 
 def write_results_to_excel(results: Dict[str, List[str]], output_path: str):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Results"
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Results")
     ws.append(["ID", "Cell 1", "Cell 2", "Cell 3"])
     for id_value, numbers in results.items():
         row = [id_value] + numbers + [""] * (3 - len(numbers))
         ws.append(row)
     wb.save(output_path)
+
+def _add_styles(wb: Workbook):
+    # Named styles are stored once in the workbook; cells only reference them by name
+    thin = Side(style="thin")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    center = Alignment(horizontal="center", wrap_text=True)
+    wb.add_named_style(NamedStyle(name="aegis_title", font=Font(bold=True, size=14)))
+    wb.add_named_style(NamedStyle(
+        name="aegis_header",
+        font=Font(bold=True, size=12, color="FFFFFF"),
+        fill=PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid"),
+        border=border,
+        alignment=center
+    ))
+    wb.add_named_style(NamedStyle(name="aegis_cell", font=Font(size=11), border=border, alignment=center))
+
+def _resolve_style(ws, name: str):
+    # Resolving a named style costs a lookup per cell; do it once and share
+    # the resulting style array, which write-only cells never mutate.
+    template = WriteOnlyCell(ws)
+    template.style = name
+    return template._style
+
+def _styled_row(ws, values, style) -> List[WriteOnlyCell]:
+    row = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        cell._style = style
+        row.append(cell)
+    return row
+
+def _where(pdf_filename: Optional[str], status: Optional[str]):
+    clauses, params = [], []
+    if pdf_filename:
+        clauses.append("p.pdf_filename = ?")
+        params.append(pdf_filename)
+    if status:
+        clauses.append("p.status = ?")
+        params.append(status)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def _column_widths(where: str, params: List) -> List[int]:
+    # Write-only sheets emit column widths before the first row, so the widths
+    # come from one aggregate query up front instead of a rescan afterwards.
+    lengths = db.get_conn().execute(
+        f'''SELECT MAX(LENGTH(p.pdf_filename)), MAX(LENGTH(p.municipality)), MAX(LENGTH(p.township)),
+                   MAX(LENGTH(p.sectional_scheme_name)), MAX(LENGTH(p.unit)), MAX(LENGTH(p.name)), MAX(LENGTH(p.identifier))
+            FROM processed_ids p{where}''',
+        params
+    ).fetchone()
+    widths = []
+    for header, length in zip(EXPORT_HEADERS, list(lengths) + [PHONE_WIDTH] * 3):
+        width = max(len(header), length or 0) + 4
+        widths.append(min(max(width, MIN_COLUMN_WIDTH), MAX_COLUMN_WIDTH))
+    return widths
+
+ROWS_SQL = '''SELECT p.pdf_filename, p.municipality, p.township, p.sectional_scheme_name, p.unit, p.name, p.identifier,
+                     l.phone_numbers, p.processed_at, p.id
+              FROM processed_ids p LEFT JOIN lookup_cache l ON l.identifier = p.identifier'''
+
+def _export_rows(cur):
+    """
+    Yields (row values, (processed_at, id)) for each row of a ROWS_SQL cursor.
+    """
+    for row in cur:
+        phone_numbers, processed_at, record_id = row[-3:]
+        numbers = json.loads(phone_numbers) if phone_numbers else []
+        numbers = (numbers + ["", "", ""])[:3]
+        yield list(row[:-3]) + numbers, (processed_at or "", record_id)
+
+def _write_workbook(output_path: str, title: str, where: str, params: List,
+                    order_by: str = "p.id") -> Tuple[int, Optional[Tuple[str, int]]]:
+    wb = Workbook(write_only=True)
+    _add_styles(wb)
+    ws = wb.create_sheet(REPORT_SHEET)
+    for col, width in enumerate(_column_widths(where, params), start=1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+
+    title_style, header, body = (_resolve_style(ws, name) for name in ("aegis_title", "aegis_header", "aegis_cell"))
+
+    ws.append(_styled_row(ws, [f"Report Date: {datetime.now().strftime('%Y-%m-%d %I:%M %p SAST')}"], title_style))
+    ws.append(_styled_row(ws, [title], title_style))
+    ws.append(_styled_row(ws, EXPORT_HEADERS, header))
+
+    cur = db.get_conn().execute(f"{ROWS_SQL}{where} ORDER BY {order_by}", params)
+    count = 0
+    last_mark = None
+    for values, mark in _export_rows(cur):
+        ws.append(_styled_row(ws, values, body))
+        last_mark = max(last_mark, mark) if last_mark else mark
+        count += 1
+    wb.save(output_path)
+    return count, last_mark
+
+def export_records(output_path: str, pdf_filename: Optional[str] = None, status: Optional[str] = "done") -> int:
+    """
+    Streams processed_ids (joined with the looked-up phone numbers) straight
+    from a database cursor into a write-only workbook, so memory use stays
+    flat however many rows are exported. Filters by PDF and status when
+    given. Returns the number of data rows written.
+    An export of every 'done' row is what export_new_records would have
+    written, so it becomes that file's high-water mark; any other export
+    replaces the file with different rows and clears the mark.
+    """
+    with metrics.timed(metrics.EXCEL_WRITE):
+        where, params = _where(pdf_filename, status)
+        count, last_mark = _write_workbook(output_path, pdf_filename or "All PDFs", where, params)
+        if pdf_filename is None and status == "done":
+            db.set_export_mark(output_path, last_mark or ("", 0))
+        else:
+            db.clear_export_mark(output_path)
+    metrics.flush()
+    return count
+
+def export_new_records(output_path: str) -> Tuple[int, str]:
+    """
+    Incremental export: writes only the records that became 'done' since the
+    last export to output_path, tracked by a (processed_at, id) high-water
+    mark in the database. The first export to a file (or one whose file has
+    gone) writes the full workbook to output_path; later ones stream just
+    the new rows into a part file next to it ("report.part2.xlsx", ...), so
+    each costs O(new rows) however large the report has grown.
+    Returns (number of data rows written, path written to); nothing is
+    written when there are no new rows.
+    """
+    with metrics.timed(metrics.EXCEL_WRITE):
+        count, path = _write_new_records(output_path)
+    metrics.flush()
+    return count, path
+
+def _write_full_export(output_path: str) -> int:
+    where, params = _where(None, "done")
+    count, last_mark = _write_workbook(output_path, "All PDFs", where, params)
+    db.set_export_mark(output_path, last_mark or ("", 0))
+    return count
+
+def _part_path(output_path: str) -> str:
+    root, ext = os.path.splitext(output_path)
+    part = 2
+    while os.path.exists(f"{root}.part{part}{ext}"):
+        part += 1
+    return f"{root}.part{part}{ext}"
+
+def _write_new_records(output_path: str) -> Tuple[int, str]:
+    mark = db.get_export_mark(output_path)
+    if mark is None or not os.path.exists(output_path):
+        return _write_full_export(output_path), output_path
+
+    where = " WHERE p.status = 'done' AND (p.processed_at, p.id) > (?, ?)"
+    params = list(mark)
+    if db.get_conn().execute(f"SELECT 1 FROM processed_ids p{where} LIMIT 1", params).fetchone() is None:
+        return 0, output_path
+    part_path = _part_path(output_path)
+    count, last_mark = _write_workbook(part_path, f"New records since {mark[0][:16].replace('T', ' ') or 'start'}",
+                                       where, params, "p.processed_at, p.id")
+    db.set_export_mark(output_path, last_mark)
+    return count, part_path
@@ -1,10 +1,15 @@
 import os
+import multiprocessing
+import queue
+import threading
 import customtkinter as ctk
 import tkinter.filedialog as fd
 from tkinterdnd2 import TkinterDnD, DND_FILES
 import db
+import metrics
 import keyring
 import json
+from datetime import datetime, timedelta
 
 # --- MODERN DARK BLUE & GREY PALETTE ---
 DARK_BLUE = "#1a2233"  # main background
@@ -55,6 +60,19 @@ class ModernHeader(ctk.CTkCanvas):
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("dark-blue")
 
+# How often the Home page drains progress events from a running job, and how
+# many it handles per tick so a burst of events can't stall the UI
+JOB_POLL_MS = 100
+JOB_EVENTS_PER_POLL = 200
+
+# Columns shown on the Results page
+RESULT_COLUMNS = ["municipality", "township", "sectional_scheme_name", "unit", "size", "name", "identifier", "status", "processed_at"]
+
+# The Stats page re-reads the metrics table this often while it is visible,
+# covering timings from the last STATS_WINDOW_DAYS
+STATS_REFRESH_MS = 2000
+STATS_WINDOW_DAYS = 30
+
 # --- Sidebar Tabs ---
 PAGES = ["Home", "Excel", "Results", "Virtual Agent", "Stats"]
 
@@ -150,9 +168,13 @@ class ModernMainContent(ctk.CTkFrame):
         self.current_page = "Home"
     def show_page(self, page_name_to_show: str):
         if page_name_to_show in self.pages:
+            if hasattr(self.pages[self.current_page], "on_hide"):
+                self.pages[self.current_page].on_hide()
             self.pages[self.current_page].grid_remove()
             self.pages[page_name_to_show].grid()
             self.current_page = page_name_to_show
+            if hasattr(self.pages[page_name_to_show], "on_show"):
+                self.pages[page_name_to_show].on_show()
         else:
             print(f"Error: Page '{page_name_to_show}' not found.")
 
@@ -173,6 +195,7 @@ class HomePage(ctk.CTkScrollableFrame):
         self.app = app
         self.selected_agent = ctk.StringVar()
         self.agent_names = self.load_agent_names()
+        self.job = None
         self._build_ui()
     def load_agent_names(self):
         try:
@@ -259,13 +282,42 @@ class HomePage(ctk.CTkScrollableFrame):
             text_color=WHITE
         )
         self.start_button.grid(row=6, column=0, pady=15, padx=20, sticky="ew")
+        job_controls = ctk.CTkFrame(self, fg_color="transparent")
+        job_controls.grid(row=7, column=0, padx=20, pady=(0, 5), sticky="ew")
+        job_controls.grid_columnconfigure((0, 1), weight=1)
+        self.pause_button = ctk.CTkButton(
+            job_controls,
+            text="⏸ Pause",
+            command=self.toggle_pause,
+            height=36,
+            font=ctk.CTkFont(family="Segoe UI", size=14, weight="bold"),
+            corner_radius=12,
+            fg_color=MID_BLUE,
+            hover_color=ACCENT_BLUE,
+            text_color=WHITE,
+            state="disabled"
+        )
+        self.pause_button.grid(row=0, column=0, padx=(0, 6), sticky="ew")
+        self.cancel_button = ctk.CTkButton(
+            job_controls,
+            text="✖ Cancel",
+            command=self.cancel_automation,
+            height=36,
+            font=ctk.CTkFont(family="Segoe UI", size=14, weight="bold"),
+            corner_radius=12,
+            fg_color=ERROR,
+            hover_color=MID_BLUE,
+            text_color=WHITE,
+            state="disabled"
+        )
+        self.cancel_button.grid(row=0, column=1, padx=(6, 0), sticky="ew")
         self.status_label = ctk.CTkLabel(
             self,
             text="Status: Idle",
             font=ctk.CTkFont(family="Segoe UI", size=13),
             text_color=MID_BLUE
         )
-        self.status_label.grid(row=7, column=0, padx=20, pady=10, sticky="w")
+        self.status_label.grid(row=8, column=0, padx=20, pady=10, sticky="w")
     def browse_files(self, event=None):
         file_paths = fd.askopenfilenames(
             title="Select PDF files",
@@ -299,61 +351,60 @@ class HomePage(ctk.CTkScrollableFrame):
             self.id_count = len(self.selected_files) * 3
         self.id_count_label.configure(text=f"IDs found: {self.id_count}")
     def start_automation(self):
+        if self.job and self.job.is_alive():
+            self.update_status_label("Automation is already running.", text_color=ERROR)
+            return
         if not self.selected_files:
             self.update_status_label("No files selected to process!", text_color=ERROR)
             return
         if not self.selected_agent.get():
             self.update_status_label("No virtual agent selected!", text_color=ERROR)
             return
-        self.update_status_label(f"Processing {len(self.selected_files)} file(s) with agent '{self.selected_agent.get()}'...", text_color=MID_BLUE)
-        self.app.update()
-        self.process_pdfs(self.selected_agent.get())
-    def process_pdfs(self, agent_name):
-        import pdf_parser  # Import here to avoid circular import
-        import virtual_agent_scraper  # Import here to avoid circular import
-        total_credits = self.app.credits
-        processed_count = 0
-        for pdf_path in self.selected_files:
-            pdf_filename = os.path.basename(pdf_path)
-            # --- 1. Extract records from PDF ---
+        agent_name = self.selected_agent.get()
+        username, password = get_agent_credentials(agent_name)
+        if not username or not password:
+            self.update_status_label(f"No saved credentials for agent '{agent_name}'!", text_color=ERROR)
+            return
+        import job_runner  # Import here so PyMuPDF/Playwright load on first run, not at startup
+        self.job = job_runner.AutomationJob(self.selected_files, agent_name, username, password, self.app.credits)
+        self.job.start()
+        self.start_button.configure(state="disabled")
+        self.pause_button.configure(state="normal", text="⏸ Pause")
+        self.cancel_button.configure(state="normal")
+        self.after(JOB_POLL_MS, self.poll_job)
+    def toggle_pause(self):
+        if not self.job:
+            return
+        if self.job.paused:
+            self.job.resume()
+            self.pause_button.configure(text="⏸ Pause")
+        else:
+            self.job.pause()
+            self.pause_button.configure(text="▶ Resume")
+    def cancel_automation(self):
+        if self.job:
+            self.job.cancel()
+            self.update_status_label("Cancelling...", text_color=ERROR)
+    def poll_job(self):
+        colors = {"info": MID_BLUE, "success": SUCCESS, "error": ERROR}
+        finished = False
+        for _ in range(JOB_EVENTS_PER_POLL):
             try:
-                parsed_ids = pdf_parser.parse_pdf(pdf_path)  # Should return a list of dicts
-            except Exception as e:
-                self.update_status_label(f"Error parsing {pdf_filename}: {e}", text_color=ERROR)
-                continue
-            # --- 2. Insert records into DB as 'pending' ---
-            for rec in parsed_ids:
-                db.insert_record(
-                    pdf_filename,
-                    rec.get("municipality", ""),
-                    rec.get("township", ""),
-                    rec.get("sectional_scheme_name", ""),
-                    rec.get("unit", ""),
-                    rec.get("size", ""),
-                    rec.get("name", ""),
-                    rec.get("identifier", "")
-                )
-            # --- 3. Process each record with virtual_agent_scraper ---
-            pending = db.get_pending_ids(pdf_filename)
-            for rec in pending:
-                if total_credits <= 0:
-                    self.update_status_label("No credits left!", text_color=ERROR)
-                    return
-                try:
-                    result = virtual_agent_scraper.scrape(rec, agent_name)  # Pass agent_name
-                    if result:
-                        db.update_status(rec["id"], "done")
-                        processed_count += 1
-                        total_credits -= 1
-                        self.app.credits = total_credits
-                        self.credit_label.configure(text=f"Credits Left: {self.app.credits}")
-                        self.update_status_label(f"Processed ID: {rec['identifier']}", text_color=SUCCESS)
-                    else:
-                        self.update_status_label(f"Failed: {rec['identifier']}", text_color=ERROR)
-                except Exception as e:
-                    self.update_status_label(f"Error: {e}", text_color=ERROR)
-                self.app.update()
-        self.update_status_label(f"Finished! {processed_count} IDs processed.", text_color=SUCCESS)
+                kind, data = self.job.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "credits":
+                self.app.credits = data["credits"]
+                self.credit_label.configure(text=f"Credits Left: {self.app.credits}")
+            elif kind in ("status", "finished"):
+                self.update_status_label(data["message"], text_color=colors.get(data["level"], MID_BLUE))
+                finished = kind == "finished"
+        if finished:
+            self.start_button.configure(state="normal")
+            self.pause_button.configure(state="disabled", text="⏸ Pause")
+            self.cancel_button.configure(state="disabled")
+        else:
+            self.after(JOB_POLL_MS, self.poll_job)
 
 # --- Placeholder Pages ---
 class ExcelPage(ctk.CTkFrame):
@@ -362,6 +413,8 @@ class ExcelPage(ctk.CTkFrame):
         self.app = app
         self.open_excel_var = ctk.BooleanVar(value=True)
         self.save_path_var = ctk.StringVar(value="")
+        self.incremental_var = ctk.BooleanVar(value=False)
+        self.export_events = queue.Queue()
         self._build_ui()
     def _build_ui(self):
         ctk.CTkLabel(
@@ -377,6 +430,13 @@ class ExcelPage(ctk.CTkFrame):
             font=ctk.CTkFont(family="Segoe UI", size=15),
             text_color=MID_BLUE
         ).pack(pady=10, anchor="w", padx=40)
+        ctk.CTkCheckBox(
+            self,
+            text="Only export IDs completed since the last export to this file (as a new part file)",
+            variable=self.incremental_var,
+            font=ctk.CTkFont(family="Segoe UI", size=15),
+            text_color=MID_BLUE
+        ).pack(pady=10, anchor="w", padx=40)
         frame = ctk.CTkFrame(self, fg_color=WHITE, corner_radius=12)
         frame.pack(pady=20, padx=30, fill="x")
         ctk.CTkLabel(
@@ -406,6 +466,60 @@ class ExcelPage(ctk.CTkFrame):
             border_width=0,
             text_color=WHITE
         ).pack(side="left", padx=10, pady=10)
+        self.export_button = ctk.CTkButton(
+            self,
+            text="Export Completed IDs",
+            command=self.start_export,
+            height=40,
+            font=ctk.CTkFont(family="Segoe UI", size=14, weight="bold"),
+            corner_radius=8,
+            fg_color=ACCENT_BLUE,
+            hover_color=MID_BLUE,
+            border_width=0,
+            text_color=WHITE
+        )
+        self.export_button.pack(pady=10, anchor="w", padx=40)
+        self.export_status = ctk.CTkLabel(
+            self,
+            text="",
+            font=ctk.CTkFont(family="Segoe UI", size=13),
+            text_color=MID_BLUE
+        )
+        self.export_status.pack(pady=5, anchor="w", padx=40)
+    def start_export(self):
+        output_path = self.save_path_var.get().strip()
+        if not output_path:
+            self.export_status.configure(text="Choose where to save the Excel file first.", text_color=ERROR)
+            return
+        self.export_button.configure(state="disabled")
+        self.export_status.configure(text="Exporting...", text_color=MID_BLUE)
+        # Large exports stream from the DB on a worker thread; the result comes back via a queue
+        threading.Thread(target=self._run_export, args=(output_path, self.incremental_var.get()), daemon=True).start()
+        self.after(JOB_POLL_MS, self.poll_export)
+    def _run_export(self, output_path: str, incremental: bool):
+        import excel_writer
+        try:
+            if incremental:
+                count, output_path = excel_writer.export_new_records(output_path)
+                message = f"Added {count} new record(s) to {os.path.basename(output_path)}."
+            else:
+                count = excel_writer.export_records(output_path)
+                message = f"Exported {count} record(s) to {os.path.basename(output_path)}."
+            self.export_events.put((message, SUCCESS, output_path))
+        except Exception as e:
+            self.export_events.put((f"Export failed: {e}", ERROR, None))
+        finally:
+            db.close_conn()
+    def poll_export(self):
+        try:
+            message, color, output_path = self.export_events.get_nowait()
+        except queue.Empty:
+            self.after(JOB_POLL_MS, self.poll_export)
+            return
+        self.export_status.configure(text=message, text_color=color)
+        self.export_button.configure(state="normal")
+        if output_path and self.open_excel_var.get() and hasattr(os, "startfile"):
+            os.startfile(output_path)
     def browse_save_path(self):
         file_path = fd.asksaveasfilename(
             title="Save Excel File As",
@@ -415,11 +529,108 @@ class ExcelPage(ctk.CTkFrame):
         if file_path:
             self.save_path_var.set(file_path)
 
+class VirtualTable(ctk.CTkFrame):
+    """
+    Table that only creates labels for the rows that fit on screen. Scrolling
+    re-fills those same labels from the next records instead of creating new
+    widgets, and records are fetched a page at a time through
+    fetch_page(limit, offset), so the row count never affects widget count.
+    """
+    ROW_HEIGHT = 30
+    PAGE_SIZE = 200
+    MAX_CACHED_PAGES = 5
+    MAX_CELL_CHARS = 28
+    def __init__(self, master, headers, **kwargs):
+        super().__init__(master, fg_color=WHITE, corner_radius=14, **kwargs)
+        self.headers = headers
+        self.total = 0
+        self.offset = 0
+        self.fetch_page = None
+        self.pages = {}
+        self.row_labels = []
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        header_frame = ctk.CTkFrame(self, fg_color=WHITE)
+        header_frame.grid(row=0, column=0, sticky="ew", padx=6, pady=(6, 0))
+        for col, h in enumerate(headers):
+            header_frame.grid_columnconfigure(col, weight=1, uniform="col")
+            ctk.CTkLabel(header_frame, text=h.upper(), font=ctk.CTkFont(size=13, weight="bold"), text_color=ACCENT_BLUE, fg_color=LIGHT_GREY, width=22).grid(row=0, column=col, padx=6, pady=4, sticky="nsew")
+        self.body = ctk.CTkFrame(self, fg_color=WHITE)
+        self.body.grid(row=1, column=0, sticky="nsew", padx=6, pady=(0, 6))
+        self.body.grid_propagate(False)
+        for col in range(len(headers)):
+            self.body.grid_columnconfigure(col, weight=1, uniform="col")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, rowspan=2, sticky="ns", padx=(0, 4), pady=6)
+        self.body.bind("<Configure>", self.on_resize)
+        self.bind_wheel(self.body)
+    def bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", lambda e: self.scroll_by(-1 if e.delta > 0 else 1))
+        widget.bind("<Button-4>", lambda e: self.scroll_by(-1))
+        widget.bind("<Button-5>", lambda e: self.scroll_by(1))
+    def set_source(self, total, fetch_page):
+        self.total = total
+        self.fetch_page = fetch_page
+        self.pages.clear()
+        self.offset = 0
+        self.render()
+    def on_resize(self, event):
+        visible = max(1, event.height // self.ROW_HEIGHT)
+        # Grow or shrink the label pool to exactly the rows that fit
+        while len(self.row_labels) < visible:
+            row = len(self.row_labels)
+            labels = []
+            for col in range(len(self.headers)):
+                lbl = ctk.CTkLabel(self.body, text="", font=ctk.CTkFont(size=12), text_color=MID_BLUE, width=22, height=self.ROW_HEIGHT - 4, anchor="w")
+                lbl.grid(row=row, column=col, padx=6, pady=2, sticky="nsew")
+                self.bind_wheel(lbl)
+                labels.append(lbl)
+            self.row_labels.append(labels)
+        while len(self.row_labels) > visible:
+            for lbl in self.row_labels.pop():
+                lbl.destroy()
+        self.scroll_to(self.offset)
+    def on_scrollbar(self, *args):
+        visible = len(self.row_labels)
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.total))
+        elif args[0] == "scroll":
+            step = visible if args[2] == "pages" else 1
+            direction = 1 if float(args[1]) > 0 else -1
+            self.scroll_to(self.offset + direction * step)
+    def scroll_by(self, rows):
+        self.scroll_to(self.offset + rows * 3)
+    def scroll_to(self, offset):
+        self.offset = max(0, min(offset, self.total - len(self.row_labels)))
+        self.render()
+    def record_at(self, index):
+        page = index // self.PAGE_SIZE
+        if page not in self.pages:
+            if len(self.pages) >= self.MAX_CACHED_PAGES:
+                self.pages.pop(next(iter(self.pages)))
+            self.pages[page] = self.fetch_page(self.PAGE_SIZE, page * self.PAGE_SIZE)
+        rows = self.pages[page]
+        offset_in_page = index - page * self.PAGE_SIZE
+        return rows[offset_in_page] if offset_in_page < len(rows) else None
+    def render(self):
+        for row, labels in enumerate(self.row_labels):
+            index = self.offset + row
+            rec = self.record_at(index) if self.fetch_page and index < self.total else None
+            bg = MID_GREY if index % 2 else WHITE
+            for col, h in enumerate(self.headers):
+                text = "" if rec is None or rec.get(h) is None else str(rec.get(h))
+                if len(text) > self.MAX_CELL_CHARS:
+                    text = text[:self.MAX_CELL_CHARS - 1] + "…"
+                labels[col].configure(text=text, fg_color=bg if rec else WHITE)
+        if self.total:
+            self.scrollbar.set(self.offset / self.total, min(1.0, (self.offset + len(self.row_labels)) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
 class ResultsPage(ctk.CTkFrame):
     def __init__(self, master):
         super().__init__(master, fg_color=LIGHT_GREY, corner_radius=16)
         self.selected_pdf = ctk.StringVar()
-        self.records = []
         self._build_ui()
     def _build_ui(self):
         ctk.CTkLabel(self, text="Results", font=ctk.CTkFont(size=22, weight="bold"), text_color=ACCENT_BLUE).pack(pady=(24, 10))
@@ -433,54 +644,44 @@ class ResultsPage(ctk.CTkFrame):
         # Summary
         self.summary_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(size=14, weight="bold"), text_color=MID_BLUE)
         self.summary_label.pack(pady=(0, 8))
-        # Scrollable table area
-        self.table_scroll = ctk.CTkScrollableFrame(self, fg_color=WHITE, corner_radius=14, width=1200, height=350)  # wider
-        self.table_scroll.pack(padx=30, pady=10, fill="both", expand=True)
-        self.table_labels = []
+        # Virtualized table area: only the visible rows exist as widgets
+        self.table = VirtualTable(self, RESULT_COLUMNS, width=1200, height=350)
+        self.table.pack(padx=30, pady=10, fill="both", expand=True)
         self.selected_pdf.trace_add('write', lambda *a: self.display_table())
         if self.get_pdf_list():
             self.selected_pdf.set(self.get_pdf_list()[0])
             self.display_table()
     def get_pdf_list(self):
         import db
-        with db.get_conn() as conn:
-            cur = conn.execute('SELECT DISTINCT pdf_filename FROM processed_ids')
-            return [row[0] for row in cur.fetchall()]
+        return db.get_pdf_filenames()
     def on_pdf_select(self, value):
         self.display_table()
     def display_table(self):
         import db
-        for label in self.table_labels:
-            label.destroy()
-        self.table_labels.clear()
         pdf = self.selected_pdf.get()
         if not pdf:
             self.summary_label.configure(text="")
+            self.table.set_source(0, None)
             return
-        records = db.get_all_records(pdf)
-        headers = ["municipality", "township", "sectional_scheme_name", "unit", "size", "name", "identifier", "status", "processed_at"]
-        # Summary
-        total = len(records)
-        done = sum(1 for r in records if r.get("status") == "done")
-        pending = total - done
-        self.summary_label.configure(text=f"Total IDs: {total}   Done: {done}   Pending: {pending}")
-        # Header row
-        for col, h in enumerate(headers):
-            lbl = ctk.CTkLabel(self.table_scroll, text=h.upper(), font=ctk.CTkFont(size=13, weight="bold"), text_color=ACCENT_BLUE, fg_color=LIGHT_GREY, width=22)
-            lbl.grid(row=0, column=col, padx=6, pady=4, sticky="nsew")
-            self.table_labels.append(lbl)
-        # Data rows with alternating colors
-        for row, rec in enumerate(records, start=1):
-            bg = MID_GREY if row % 2 == 0 else WHITE
-            for col, h in enumerate(headers):
-                val = rec.get(h, "")
-                # Use a label with wraplength for text wrapping
-                lbl = ctk.CTkLabel(self.table_scroll, text=str(val), font=ctk.CTkFont(size=12), text_color=MID_BLUE, fg_color=bg, width=22, wraplength=140, anchor="w", justify="left")
-                lbl.grid(row=row, column=col, padx=6, pady=2, sticky="nsew")
-                self.table_labels.append(lbl)
+        # Summary from SQL counts; rows are paged in by the table as it scrolls
+        counts = db.count_records(pdf)
+        total = sum(counts.values())
+        done = counts.get("done", 0)
+        no_result = counts.get("no_result", 0)
+        failed = counts.get("failed", 0)
+        pending = total - done - no_result - failed
+        self.summary_label.configure(
+            text=f"Total IDs: {total}   Done: {done}   No result: {no_result}   Failed: {failed}   Pending: {pending}"
+        )
+        self.table.set_source(total, lambda limit, offset: db.get_records_page(pdf, limit, offset))
 
 AGENTS_FILE = "agents.json"
 
+def get_agent_credentials(agent_name):
+    username = keyring.get_password("AutomateAgent", f"{agent_name}_username") or ""
+    password = keyring.get_password("AutomateAgent", f"{agent_name}_password") or ""
+    return username, password
+
 class VirtualAgentPage(ctk.CTkFrame):
     def __init__(self, master):
         super().__init__(master, fg_color=LIGHT_GREY, corner_radius=16)
@@ -635,80 +836,145 @@ class VirtualAgentPage(ctk.CTkFrame):
     def get_password(self, name):
         return keyring.get_password("AutomateAgent", f"{name}_password") or ""
 
-class StatsPage(ctk.CTkFrame):
+def format_duration(ms) -> str:
+    if ms is None:
+        return "-"
+    if ms < 1000:
+        return f"{ms:.0f} ms"
+    if ms < 60000:
+        return f"{ms / 1000:.1f}s"
+    return f"{ms / 60000:.1f} min"
+
+class StatsPage(ctk.CTkScrollableFrame):
     def __init__(self, master):
         super().__init__(master, fg_color=LIGHT_GREY, corner_radius=16)
         self.grid_columnconfigure(0, weight=1)
         self.grid_columnconfigure(1, weight=1)
+        self.value_labels = {}
+        self.stage_labels = {}
+        self._refresh_job = None
+        self._loading = False
+        self.stats_events = queue.Queue()
         # Modern, visually separated card layout
         card_bg = MID_BLUE
         card_fg = WHITE
         card_border = ACCENT_BLUE
-        # Headers
-        ctk.CTkLabel(
-            self,
-            text="Processing Stats",
-            font=ctk.CTkFont(family="Segoe UI", size=20, weight="bold"),
-            text_color=ACCENT_BLUE
-        ).grid(row=0, column=0, columnspan=2, pady=(24, 8), padx=20, sticky="w")
-        # Processing Stats Data
-        processing_stats = {
-            "PDFs Processed": 128,
-            "IDs Retrieved": 114,
-            "Successful Runs": 56,
-            "Failed Runs": 2
-        }
-        for idx, (key, value) in enumerate(processing_stats.items()):
-            col = idx % 2
-            row = (idx // 2) + 1
-            frame = ctk.CTkFrame(self, fg_color=card_bg, corner_radius=16, border_width=2, border_color=card_border)
-            frame.grid(row=row, column=col, padx=18, pady=10, sticky="ew")
+        sections = [
+            ("Processing Stats", ["PDFs Processed", "IDs Retrieved", "Successful Runs", "Failed Runs"]),
+            ("Performance Metrics", ["Lookup Throughput", "Average Run Time", "Median Page Extraction", "Median ID Lookup"]),
+        ]
+        row = 0
+        for title, keys in sections:
             ctk.CTkLabel(
-                frame,
-                text=key,
-                font=ctk.CTkFont(family="Segoe UI", size=15, weight="bold"),
+                self,
+                text=title,
+                font=ctk.CTkFont(family="Segoe UI", size=20, weight="bold"),
                 text_color=ACCENT_BLUE
-            ).pack(anchor="w", padx=16, pady=(10, 0))
-            ctk.CTkLabel(
-                frame,
-                text=str(value),
-                font=ctk.CTkFont(family="Segoe UI", size=22, weight="bold"),
-                text_color=card_fg
-            ).pack(anchor="w", padx=16, pady=(0, 10))
-        # Performance Metrics Header
-        performance_row = (len(processing_stats) // 2) + 2
+            ).grid(row=row, column=0, columnspan=2, pady=(24, 8), padx=20, sticky="w")
+            row += 1
+            for idx, key in enumerate(keys):
+                frame = ctk.CTkFrame(self, fg_color=card_bg, corner_radius=16, border_width=2, border_color=card_border)
+                frame.grid(row=row + idx // 2, column=idx % 2, padx=18, pady=10, sticky="ew")
+                ctk.CTkLabel(
+                    frame,
+                    text=key,
+                    font=ctk.CTkFont(family="Segoe UI", size=15, weight="bold"),
+                    text_color=ACCENT_BLUE
+                ).pack(anchor="w", padx=16, pady=(10, 0))
+                self.value_labels[key] = ctk.CTkLabel(
+                    frame,
+                    text="-",
+                    font=ctk.CTkFont(family="Segoe UI", size=22, weight="bold"),
+                    text_color=card_fg
+                )
+                self.value_labels[key].pack(anchor="w", padx=16, pady=(0, 10))
+            row += (len(keys) + 1) // 2
+        # Per-stage timing percentiles
         ctk.CTkLabel(
             self,
-            text="Performance Metrics",
+            text="Stage Timings",
             font=ctk.CTkFont(family="Segoe UI", size=20, weight="bold"),
             text_color=ACCENT_BLUE
-        ).grid(row=performance_row, column=0, columnspan=2, pady=(24, 8), padx=20, sticky="w")
-        # Performance Metrics Data
-        performance_metrics = {
-            "Average Time per PDF": "3.2s",
-            "Estimated Time Saved": "6.1 minutes",
-            "Streak (days processing)": 3
-        }
-        for idx, (key, value) in enumerate(performance_metrics.items()):
-            col = idx % 2
-            row = performance_row + 1 + (idx // 2)
-            frame = ctk.CTkFrame(self, fg_color=card_bg, corner_radius=16, border_width=2, border_color=card_border)
-            frame.grid(row=row, column=col, padx=18, pady=10, sticky="ew")
+        ).grid(row=row, column=0, columnspan=2, pady=(24, 8), padx=20, sticky="w")
+        table = ctk.CTkFrame(self, fg_color=card_bg, corner_radius=16, border_width=2, border_color=card_border)
+        table.grid(row=row + 1, column=0, columnspan=2, padx=18, pady=10, sticky="ew")
+        headers = ["Stage", "Samples", "p50", "p95", "p99"]
+        for col, header in enumerate(headers):
+            table.grid_columnconfigure(col, weight=1)
             ctk.CTkLabel(
-                frame,
-                text=key,
-                font=ctk.CTkFont(family="Segoe UI", size=15, weight="bold"),
+                table,
+                text=header,
+                font=ctk.CTkFont(family="Segoe UI", size=14, weight="bold"),
                 text_color=ACCENT_BLUE
-            ).pack(anchor="w", padx=16, pady=(10, 0))
-            ctk.CTkLabel(
-                frame,
-                text=str(value),
-                font=ctk.CTkFont(family="Segoe UI", size=22, weight="bold"),
-                text_color=card_fg
-            ).pack(anchor="w", padx=16, pady=(0, 10))
-
+            ).grid(row=0, column=col, padx=12, pady=(10, 4), sticky="w")
+        for r, (stage, label) in enumerate(metrics.STAGE_LABELS.items(), start=1):
+            cells = []
+            for col in range(len(headers)):
+                cell = ctk.CTkLabel(
+                    table,
+                    text=label if col == 0 else "-",
+                    font=ctk.CTkFont(family="Segoe UI", size=14),
+                    text_color=card_fg
+                )
+                cell.grid(row=r, column=col, padx=12, pady=4, sticky="w")
+                cells.append(cell)
+            self.stage_labels[stage] = cells[1:]
+    def on_show(self):
+        self.refresh()
+    def on_hide(self):
+        if self._refresh_job:
+            self.after_cancel(self._refresh_job)
+            self._refresh_job = None
+    def refresh(self):
+        self.on_hide()
+        if not self._loading:
+            # The percentile query grows with the metrics table, so it runs on a
+            # worker thread and the result comes back via a queue
+            self._loading = True
+            threading.Thread(target=self._load_stats, daemon=True).start()
+        self._refresh_job = self.after(JOB_POLL_MS, self.poll_stats)
+    def _load_stats(self):
+        since = (datetime.now() - timedelta(days=STATS_WINDOW_DAYS)).isoformat()
+        try:
+            self.stats_events.put((db.get_processing_totals(), db.get_run_stats(since), db.get_stage_stats(since)))
+        except Exception as e:
+            print(f"Could not load stats: {e}")
+            self.stats_events.put(None)
+        finally:
+            db.close_conn()
+    def poll_stats(self):
+        try:
+            loaded = self.stats_events.get_nowait()
+        except queue.Empty:
+            self._refresh_job = self.after(JOB_POLL_MS, self.poll_stats)
+            return
+        self._loading = False
+        self._refresh_job = None
+        if loaded is None:
+            return
+        totals, runs, stages = loaded
+        values = {
+            "PDFs Processed": totals["pdfs"],
+            "IDs Retrieved": totals["ids_done"],
+            "Successful Runs": runs["successful_runs"],
+            "Failed Runs": runs["failed_runs"],
+            "Lookup Throughput": f"{runs['ids_per_minute']:.1f} IDs/min",
+            "Average Run Time": format_duration(runs["avg_run_ms"] if runs["successful_runs"] + runs["failed_runs"] else None),
+            "Median Page Extraction": format_duration(stages.get(metrics.PAGE_EXTRACT, {}).get("p50_ms")),
+            "Median ID Lookup": format_duration(stages.get(metrics.ID_LOOKUP, {}).get("p50_ms")),
+        }
+        for key, value in values.items():
+            self.value_labels[key].configure(text=str(value))
+        for stage, cells in self.stage_labels.items():
+            stats = stages.get(stage)
+            texts = [str(stats["samples"])] + [format_duration(stats[k]) for k in ("p50_ms", "p95_ms", "p99_ms")] if stats else ["0", "-", "-", "-"]
+            for cell, text in zip(cells, texts):
+                cell.configure(text=text)
+        # Keep the numbers live while a run is writing new timings
+        self._refresh_job = self.after(STATS_REFRESH_MS, self.refresh)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # PDF extraction worker processes in the frozen build
     db.ensure_db()  # Initialize the database at app startup
     app = AutomateAgentApp()
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,308 @@
+# job_runner.py
+"""
+Runs the parse -> insert -> scrape pipeline on a worker thread so the Tk main
+loop never blocks. Progress is posted as (kind, data) events on a thread-safe
+queue that the GUI drains with after(); the GUI never touches widgets from
+this thread.
+Every job is a row in the runs table: it leases the records it looks up and
+keeps the leases alive with a heartbeat, so after a crash the next job skips
+reports that are already stored and picks up the unfinished records.
+Exports: AutomationJob(pdf_paths, agent_name, username, password, credits)
+"""
+import itertools
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import List
+import db
+import metrics
+import pdf_parser
+import virtual_agent_scraper
+
+# Completed lookups are written to the DB in batches of this size
+STATUS_FLUSH_EVERY = 25
+# Minimum records from a streamed PDF stored and queued for lookup at once
+SCRAPE_BATCH_SIZE = 50
+# How often a running job renews its leases; well inside db.RUN_LEASE_SECONDS
+HEARTBEAT_SECONDS = 15
+
+class JobCancelled(Exception):
+    pass
+
+class AutomationJob(threading.Thread):
+    """
+    Event kinds put on self.events:
+      ("status",   {"message": str, "level": "info" | "success" | "error"})
+      ("credits",  {"credits": int})
+      ("finished", {"message": str, "level": str})  -- always the last event
+    """
+    def __init__(self, pdf_paths: List[str], agent_name: str, username: str, password: str, credits: int):
+        super().__init__(daemon=True)
+        self.pdf_paths = list(pdf_paths)
+        self.agent_name = agent_name
+        self.username = username
+        self.password = password
+        self.credits = credits
+        self.processed_count = 0
+        self.run_id = None
+        self.events = queue.Queue()
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+        self._stopped = threading.Event()
+        self._paused_at = None
+        self._paused_seconds = 0.0
+
+    # --- Controls, called from the Tk thread ---
+    def pause(self):
+        if self._paused_at is None:
+            self._paused_at = time.perf_counter()
+        self._running.clear()
+        self._emit("status", message="Paused.", level="info")
+
+    def resume(self):
+        self._end_pause()
+        self._running.set()
+        self._emit("status", message="Resumed.", level="info")
+
+    def cancel(self):
+        self._cancelled.set()
+        self._end_pause()
+        self._running.set()  # wake a paused job so it can stop
+
+    def _end_pause(self):
+        # Time spent paused is left out of the run's duration metric
+        if self._paused_at is not None:
+            self._paused_seconds += time.perf_counter() - self._paused_at
+            self._paused_at = None
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    # --- Worker thread ---
+    def _emit(self, kind: str, **data):
+        self.events.put((kind, data))
+
+    def _status(self, message: str, level: str = "info"):
+        self._emit("status", message=message, level=level)
+
+    def checkpoint(self) -> bool:
+        """Blocks while paused; returns False once the job has been cancelled."""
+        self._running.wait()
+        return not self._cancelled.is_set()
+
+    def _check(self):
+        if not self.checkpoint():
+            raise JobCancelled()
+
+    def run(self):
+        start = time.perf_counter()
+        message, level, run_status = "Error.", "error", "failed"
+        try:
+            message, level = self._run()
+            if level == "success":
+                run_status = "finished"
+        except JobCancelled:
+            message, level, run_status = "Cancelled.", "error", "cancelled"
+        except Exception as e:
+            message, level = f"Error: {e}", "error"
+        finally:
+            self._stopped.set()
+            if self.run_id is not None:
+                db.finish_run(self.run_id, run_status, message)
+            metrics.record(metrics.RUN, time.perf_counter() - start - self._paused_seconds, self.processed_count, ok=level == "success")
+            metrics.flush()
+            db.close_conn()
+        self._emit("finished", message=message, level=level)
+
+    def _heartbeat(self):
+        # Runs on its own thread so leases stay alive while the job is paused
+        try:
+            while not self._stopped.wait(HEARTBEAT_SECONDS):
+                try:
+                    db.heartbeat_run(self.run_id)
+                except sqlite3.Error:
+                    pass
+        finally:
+            db.close_conn()
+
+    def _iter_parsed_batches(self, pdf_paths: List[str]):
+        # A single report is streamed page by page so its first owners are stored
+        # and scraped while later pages are still being parsed; a batch of
+        # reports is parsed in parallel and handed over file by file. The last
+        # item of each fully parsed report is flagged complete.
+        if len(pdf_paths) == 1:
+            pdf_path = pdf_paths[0]
+            try:
+                found = False
+                batch = []
+                for _, page_records in itertools.groupby(pdf_parser.iter_records(pdf_path), key=lambda rec: rec["page"]):
+                    found = True
+                    batch.extend(page_records)
+                    # Whole pages at a time, but enough of them to be worth a transaction
+                    if len(batch) >= SCRAPE_BATCH_SIZE:
+                        yield pdf_path, batch, None, False
+                        batch = []
+                if found:
+                    yield pdf_path, batch, None, True
+                else:
+                    yield pdf_path, [], ValueError("No matching data found in PDF."), False
+            except Exception as e:
+                yield pdf_path, [], e, False
+        elif pdf_paths:
+            for pdf_path, records, error in pdf_parser.extract_many(pdf_paths, workers=None):
+                yield pdf_path, records, error, error is None
+
+    def _run(self):
+        lookup_cache_hits = 0
+        failed_count = 0
+        cache_hits_before = pdf_parser.cache_stats()["hits"]
+        reclaimed = db.recover_stale_runs()
+        self.run_id = db.start_run(self.agent_name, self.pdf_paths)
+        threading.Thread(target=self._heartbeat, daemon=True).start()
+        self._status(f"Processing {len(self.pdf_paths)} file(s) with agent '{self.agent_name}'...")
+        if reclaimed:
+            self._status(f"Resuming {reclaimed} record(s) left unfinished by an interrupted run.")
+        # Reports whose records were all stored by an earlier run are not parsed again
+        hashes = {}
+        stored, to_parse = [], []
+        for pdf_path in self.pdf_paths:
+            try:
+                hashes[pdf_path] = pdf_parser.file_hash(pdf_path)
+            except OSError:
+                to_parse.append(pdf_path)  # the parser reports the missing file
+                continue
+            if db.is_file_ingested(os.path.basename(pdf_path), hashes[pdf_path]):
+                stored.append(pdf_path)
+            else:
+                to_parse.append(pdf_path)
+        if stored:
+            self._status(f"Skipping parsing for {len(stored)} file(s) already stored.")
+        batches = itertools.chain(((pdf_path, [], None, False) for pdf_path in stored), self._iter_parsed_batches(to_parse))
+        # All lookups share one browser session, fed by lookup_batches() on the
+        # scraper's reader thread while the callbacks below run on this one.
+        lock = threading.Lock()
+        waiting = {}   # identifier -> leased records awaiting its lookup
+        answered = {}  # identifier -> status, for records of the same ID claimed later
+        credits_left = max(self.credits, 0)
+        out_of_credits = False
+        status_updates = []
+
+        def lookup_batches():
+            nonlocal credits_left, out_of_credits
+            inserted = {}
+            handed_out = set()
+            # --- 1. Extract records, handling each batch as soon as it is parsed ---
+            for pdf_path, parsed_ids, error, complete in batches:
+                self._check()
+                pdf_filename = os.path.basename(pdf_path)
+                if error:
+                    self._status(f"Error parsing {pdf_filename}: {error}", "error")
+                    continue
+                # --- 2. Insert records into DB as 'pending' in one transaction ---
+                if parsed_ids:
+                    with metrics.timed(metrics.DB_INSERT, len(parsed_ids)):
+                        db.insert_records(pdf_filename, parsed_ids)
+                    inserted[pdf_path] = inserted.get(pdf_path, 0) + len(parsed_ids)
+                if complete and pdf_path in hashes:
+                    db.mark_file_ingested(pdf_filename, hashes[pdf_path], inserted.get(pdf_path, 0), self.run_id)
+                # --- 3. Lease this PDF's unfinished records and queue the new ones for lookup ---
+                claimed = [rec for rec in db.claim_records(pdf_filename, self.run_id) if rec["id"] not in handed_out]
+                handed_out.update(rec["id"] for rec in claimed)
+                new_ids, settled = [], []
+                with lock:
+                    for rec in claimed:
+                        id_value = rec["identifier"]
+                        if id_value in answered:
+                            settled.append((rec["id"], answered[id_value]))
+                        elif id_value in waiting:
+                            waiting[id_value].append(rec)
+                        else:
+                            waiting[id_value] = [rec]
+                            new_ids.append(id_value)
+                db.update_statuses(settled)
+                # IDs in the lookup cache are free; only real lookups need credits
+                cached_ids = db.get_cached_lookups(new_ids)
+                ids = [id_value for id_value in new_ids if id_value in cached_ids]
+                with lock:
+                    for id_value in new_ids:
+                        if id_value in cached_ids:
+                            continue
+                        if credits_left > 0:
+                            credits_left -= 1
+                            ids.append(id_value)
+                        else:
+                            out_of_credits = True
+                            del waiting[id_value]  # left leased until release_records() below
+                if ids:
+                    yield ids
+                if out_of_credits:
+                    return
+
+        def set_statuses(records, status):
+            nonlocal status_updates
+            status_updates.extend((rec["id"], status) for rec in records)
+            if len(status_updates) >= STATUS_FLUSH_EVERY:
+                db.update_statuses(status_updates)
+                status_updates = []
+
+        def on_result(id_value, numbers, from_cache):
+            nonlocal lookup_cache_hits
+            if from_cache:
+                lookup_cache_hits += 1
+            else:
+                self.credits -= 1
+                self._emit("credits", credits=self.credits)
+            status = db.DONE if numbers else db.NO_RESULT
+            with lock:
+                answered[id_value] = status
+                records = waiting.pop(id_value, [])
+            set_statuses(records, status)
+            if numbers:
+                self.processed_count += 1
+                self._status(f"Processed ID: {id_value}", "success")
+            else:
+                self._status(f"No numbers found for ID: {id_value}", "error")
+
+        def on_failure(id_value, error):
+            nonlocal credits_left, failed_count
+            with lock:
+                answered[id_value] = db.FAILED
+                records = waiting.pop(id_value, [])
+                credits_left += 1  # only answered lookups use up a credit
+            failed_count += 1
+            set_statuses(records, db.FAILED)
+            self._status(f"Failed: {id_value} ({error})", "error")
+
+        feed = lookup_batches()
+        try:
+            virtual_agent_scraper.scrape_phone_batches(
+                feed, self.username, self.password,
+                concurrency=virtual_agent_scraper.DEFAULT_CONCURRENCY,
+                on_result=on_result,
+                on_failure=on_failure,
+                session_key=self.agent_name,
+                checkpoint=self.checkpoint
+            )
+        except JobCancelled:
+            raise
+        except Exception as e:
+            return f"Error: {e}", "error"
+        finally:
+            feed.close()
+            db.update_statuses(status_updates)
+            # Anything not looked up (no credits, cancelled, browser error) goes back to 'pending'
+            db.release_records(self.run_id)
+            metrics.flush()
+        self._check()
+        if out_of_credits:
+            return "No credits left!", "error"
+        cached = pdf_parser.cache_stats()["hits"] - cache_hits_before
+        return (
+            f"Finished! {self.processed_count} IDs processed, {failed_count} failed, {lookup_cache_hits} served from lookup cache "
+            f"({cached} PDF(s) loaded from parse cache).",
+            "success"
+        )
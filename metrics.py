@@ -0,0 +1,85 @@
+# metrics.py
+"""
+Per-stage timing telemetry stored in the metrics table of automateagent.db.
+Timings are buffered in memory and written in batches, so instrumenting a hot
+path costs a list append rather than a database write.
+Exports: timed(stage, count=1), record(stage, seconds, count=1, ok=True), flush()
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Tuple
+import db
+
+# Stage names as stored in metrics.stage
+PDF_OPEN = "pdf_open"
+PAGE_EXTRACT = "page_extract"
+DB_INSERT = "db_insert"
+LOGIN = "login"
+ID_LOOKUP = "id_lookup"
+EXCEL_WRITE = "excel_write"
+RUN = "run"  # one row per automation run; count is the number of IDs processed
+
+STAGE_LABELS = {
+    PDF_OPEN: "PDF open",
+    PAGE_EXTRACT: "Page extraction",
+    DB_INSERT: "DB insert",
+    LOGIN: "Login",
+    ID_LOOKUP: "ID lookup",
+    EXCEL_WRITE: "Excel write",
+    RUN: "Automation run",
+}
+
+# Buffered rows written once this many are waiting
+FLUSH_EVERY = 200
+# Off in worker processes, which only buffer and hand their rows back through drain()
+AUTO_FLUSH = True
+
+_buffer: List[Tuple[str, float, int, int, str]] = []
+_lock = threading.Lock()
+
+def record(stage: str, seconds: float, count: int = 1, ok: bool = True):
+    with _lock:
+        _buffer.append((stage, seconds * 1000.0, count, int(ok), datetime.now().isoformat()))
+        full = AUTO_FLUSH and len(_buffer) >= FLUSH_EVERY
+    if full:
+        flush()
+
+@contextmanager
+def timed(stage: str, count: int = 1):
+    """Records how long the with-block took; failures are recorded with ok=False."""
+    start = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        record(stage, time.perf_counter() - start, count, ok)
+
+def disable_auto_flush():
+    """Pool initializer for worker processes; their rows reach the database through the parent."""
+    global AUTO_FLUSH
+    AUTO_FLUSH = False
+
+def drain() -> List[Tuple[str, float, int, int, str]]:
+    """Takes the buffered rows without writing them, e.g. to send them back from a worker process."""
+    global _buffer
+    with _lock:
+        rows, _buffer = _buffer, []
+    return rows
+
+def absorb(rows: List[Tuple[str, float, int, int, str]]):
+    """Adds rows drained in another process to this process's buffer."""
+    with _lock:
+        _buffer.extend(rows)
+
+def flush():
+    rows = drain()
+    if not rows:
+        return
+    try:
+        db.record_metrics(rows)
+    except Exception as e:
+        # Telemetry must never break processing
+        print(f"Could not save metrics: {e}")
@@ -0,0 +1,27 @@
+# owner_matcher.py
+"""
+Finds owner rows (unit, size, name, 13-digit ID) in the text of one PDF block.
+Shared by pdf_parser and debug_pdf_parser so both match exactly the same rows.
+Exports: find_owners(text: str) -> List[Tuple[str, str, str, str]]
+"""
+import re
+from typing import List, Tuple
+
+# Every owner row ends in a 13-digit ID number; blocks without one (headers,
+# footers, addresses, company rows) are skipped before the full pattern runs.
+ID_RUN = re.compile(r"\d{13}", re.ASCII)
+
+# unit, size, name (upper-case words), identifier. Matches start only at the
+# beginning of a number (not at every digit inside an ID), and the name is
+# words separated by whitespace rather than a lazy run of letters-or-spaces,
+# so a failed attempt gives up after one pass instead of retrying every split
+# of the name. Report text is ASCII, which keeps the \d/\s/\b tests cheap.
+OWNER_PATTERN = re.compile(
+    r"\b(\d+)\s+(\d+)\s+([A-Z]+(?:\s+[A-Z]+)*)\s+(\d{13})\b", re.ASCII
+)
+
+def find_owners(text: str) -> List[Tuple[str, str, str, str]]:
+    """Returns (unit, size, name, identifier) for every owner row in text."""
+    if not ID_RUN.search(text):
+        return []
+    return OWNER_PATTERN.findall(text)
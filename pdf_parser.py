@@ -1,37 +1,437 @@
-import fitz  # PyMuPDF
-import re
-from typing import List, Dict
+import functools
+import hashlib
+import itertools
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from importlib.metadata import entry_points
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Tuple
+import db
+import metrics
+from owner_matcher import ID_RUN, find_owners
+
+# Bump whenever the records produced for the same PDF change, so stale
+# entries in the parse cache are ignored.
+PARSER_VERSION = "4"
+
+# Parse cache hit/miss counters for this process
+CACHE_STATS = {"hits": 0, "misses": 0}
+
+# Smallest page range worth shipping to another process; below this the
+# pool start-up and pickling cost more than the extraction itself.
+MIN_PAGES_PER_WORKER = 4
+
+# Owner tables start under the column header and are followed by these
+# sections, which never hold owner rows
+TABLE_HEADER = "IDENTIFIER"
+SECTION_END_MARKERS = ("Size Summary", "Disclaimer")
+# Section title on the first page of every Lightstone owners report
+LIGHTSTONE_MARKER = "Owner Details"
+
+# Scheme details on the first page of a report: each label is its own
+# block, followed by the block holding its value. Estate reports have no
+# scheme name, so that field stays empty for them.
+DETAIL_LABELS = {
+    "MUNICIPALITY": "municipality",
+    "TOWNSHIP": "township",
+    "SECTIONAL SCHEME NAME": "sectional_scheme_name",
+}
+DETAILS_MARKER = "MUNICIPALITY"
+
+# Bump when classify_page or what the page index stores changes, so stored indexes are rebuilt
+CLASSIFIER_VERSION = "3"
+
+# Owner table columns read by the word-position parser. Estate reports add
+# ERF and PORTION columns to the left, which are ignored. Cells start a few
+# points left of their column header (IDs sit 2pt left of IDENTIFIER).
+TABLE_COLUMNS = {"UNIT": "unit", "SIZE": "size", "NAME": "name", "IDENTIFIER": "identifier"}
+COLUMN_TOLERANCE = 4.0
+# How far from its unit number a row's words may sit. Rows are about 25pt
+# apart and co-owner names spread up to 18pt either side of the unit; notes
+# under the table and the page footer are over 30pt below the last row.
+ROW_REACH = 24.0
+
+# (left edge, field) per table column, field None for columns not read
+Columns = List[Tuple[float, Optional[str]]]
+# Page index entries: page -> (may hold owners, has the scheme details)
+PageClasses = Dict[int, Tuple[bool, bool]]
+
+def classify_page(textpage) -> Tuple[bool, bool, bool, bool]:
+    """
+    Cheap look at one page's plain text: (has_header, may_hold_owners,
+    ends_table, has_details). A page with no 13-digit run cannot hold an
+    owner row, so it never needs block extraction unless it carries the
+    scheme details. The text page is reused for the blocks afterwards, so
+    classifying costs no second text extraction.
+    """
+    text = textpage.extractText()
+    return (
+        TABLE_HEADER in text,
+        ID_RUN.search(text) is not None,
+        any(marker in text for marker in SECTION_END_MARKERS),
+        DETAILS_MARKER in text
+    )
+
+def empty_details() -> Dict[str, str]:
+    return {field: "" for field in DETAIL_LABELS.values()}
+
+def read_scheme_details(blocks) -> Dict[str, str]:
+    """
+    Returns the scheme details found among one page's blocks, keyed like
+    the processed_ids columns. Fields not on the page are left out.
+    """
+    details = {}
+    field = None
+    for block in blocks:
+        text = block[4].strip()
+        if field:
+            details[field] = text
+        field = DETAIL_LABELS.get(text)
+    return details
+
+def _parse_blocks(blocks, page_number: int) -> List[Dict[str, str]]:
+    results = []
+    for block_index, block in enumerate(blocks):
+        text = block[4].strip()
+        for match in find_owners(text):
+            unit, size, name, identifier = match
+            results.append({
+                "unit": unit,
+                "size": size,
+                "name": name.strip(),
+                "identifier": identifier,
+                "page": page_number,
+                "block": block_index
+            })
+    return results
+
+def table_columns(words) -> Optional[Tuple[Columns, float]]:
+    """
+    (columns, bottom of the header) when the page holds the owner table
+    header, read from the header words level with IDENTIFIER.
+    """
+    for word in words:
+        if word[4] == TABLE_HEADER:
+            columns = sorted((w[0], TABLE_COLUMNS.get(w[4])) for w in words if abs(w[1] - word[1]) < 2)
+            return columns, word[3]
+    return None
+
+def _split_names(lines: List[List[Tuple]], owners: int) -> List[str]:
+    """
+    Joins the name lines of one table row into one name per owner. Names
+    and IDs are each centred in the row independently, so positions alone
+    cannot pair them; a line is taken to continue the previous owner's name
+    when its first word is the least likely to have fitted on that line.
+    """
+    texts = [" ".join(word[4] for word in line) for line in lines]
+    if len(lines) <= owners:
+        return texts
+    overflow = [lines[i - 1][-1][2] + lines[i][0][2] - lines[i][0][0] for i in range(1, len(lines))]
+    # Co-owners often share the first owner's surname, which marks a new name
+    surname = lines[0][0][4]
+    likely = sorted(range(1, len(lines)), key=lambda i: (lines[i][0][4] != surname, overflow[i - 1]), reverse=True)
+    wrapped = set(likely[:len(lines) - owners])
+    names = []
+    for i, text in enumerate(texts):
+        if i in wrapped:
+            names[-1] += " " + text
+        else:
+            names.append(text)
+    return names
+
+def _parse_words(words, page_number: int, columns: Optional[Columns]) -> Tuple[List[Dict[str, str]], Optional[Columns]]:
+    """
+    Rebuilds owner table rows from word positions: words are bucketed into
+    columns by x and into rows by their distance from each unit number, so
+    co-owners and wrapped names that PyMuPDF splits into separate blocks
+    still end up in their row. Returns the records and the columns to use
+    for the next page, which only has a header when the table starts on it.
+    """
+    header = table_columns(words)
+    top = -1.0
+    if header:
+        columns, top = header
+    fields = [field for _, field in columns or []]
+    if not words or "unit" not in fields or "identifier" not in fields:
+        return [], columns
+
+    import numpy as np  # only this parser needs NumPy
+    texts = [word[4] for word in words]
+    boxes = np.array([word[:4] for word in words], dtype=float)
+    edges = np.array([x for x, _ in columns]) - COLUMN_TOLERANCE
+    col = np.searchsorted(edges, boxes[:, 0], side="right") - 1
+    read = np.array([field is not None for field in fields] + [False])  # col -1 indexes the False
+    centers = (boxes[:, 1] + boxes[:, 3]) / 2
+    below = boxes[:, 1] > top
+    digits = np.fromiter(map(str.isdigit, texts), bool, len(texts))
+    is_id = digits & (np.fromiter(map(len, texts), int, len(texts)) == 13)
+    anchors = np.flatnonzero(below & digits & (col == fields.index("unit")))
+    if not len(anchors):
+        return [], columns
+    anchors = anchors[np.argsort(centers[anchors], kind="stable")]
+    anchor_y = centers[anchors]
+    row = np.searchsorted((anchor_y[1:] + anchor_y[:-1]) / 2, centers)
+    members = np.flatnonzero(below & read[col] & (np.abs(centers - anchor_y[row]) <= ROW_REACH))
+    # Sort into (row, column) cells, each top to bottom and left to right,
+    # and find where every cell starts and ends
+    cell = row * len(fields) + col
+    members = members[np.lexsort((boxes[members, 0], boxes[members, 1], cell[members]))]
+    all_cells = np.arange(len(anchors) * len(fields))
+    starts = np.searchsorted(cell[members], all_cells).tolist()
+    ends = np.searchsorted(cell[members], all_cells, side="right").tolist()
+    order = members.tolist()
+    unit_col, size_col, name_col, id_col = (fields.index(field) if field in fields else -1 for field in TABLE_COLUMNS.values())
+
+    results = []
+    # Only rows holding an ID number produce records
+    for row_index in np.unique(row[members[is_id[members]]]).tolist():
+        base = row_index * len(fields)
+        ids = [words[i] for i in order[starts[base + id_col]:ends[base + id_col]]]
+        name_words = [words[i] for i in order[starts[base + name_col]:ends[base + name_col]]] if name_col >= 0 else []
+        lines = [list(line) for _, line in itertools.groupby(name_words, key=lambda word: (word[5], word[6]))]
+        names = _split_names(lines, len(ids))
+        size = " ".join(texts[i] for i in order[starts[base + size_col]:ends[base + size_col]]) if size_col >= 0 else ""
+        for owner, word in enumerate(ids):
+            # Company registration and trust numbers still count as owners
+            # when splitting names, but only ID numbers are looked up
+            if not ID_RUN.fullmatch(word[4]):
+                continue
+            results.append({
+                "unit": texts[anchors[row_index]],
+                "size": size,
+                "name": names[owner] if owner < len(names) else "",
+                "identifier": word[4],
+                "page": page_number,
+                "block": word[5]
+            })
+    return results, columns
+
+def _scan_pages(doc, page_numbers: Iterable[int], known: Optional[PageClasses] = None, use_words: bool = False,
+                columns: Optional[Columns] = None) -> Iterator[Tuple[int, List[Dict[str, str]], Dict[str, str], Tuple[bool, bool]]]:
+    """
+    Yields (page_index, records, details, (may_hold_owners, has_details))
+    for each page among page_numbers (0-based) that holds owners or the
+    scheme details, skipping the rest and stopping at the sections that
+    follow the table. details is empty except on the page the scheme details
+    were read from. known gives the classes stored in the page index, which
+    are used instead of classifying the pages again. use_words rebuilds rows
+    from word positions, starting from columns when the first page given
+    has no table header.
+    """
+    import fitz  # PyMuPDF
+    table_started = False
+    details_found = False
+    for page_num in page_numbers:
+        page = doc[page_num]
+        with metrics.timed(metrics.PAGE_EXTRACT):
+            if known is None:
+                # Same flags get_text("blocks") uses, so the blocks are unchanged
+                textpage = page.get_textpage(flags=fitz.TEXTFLAGS_BLOCKS)
+                has_header, may_hold_owners, ends_table, has_details = classify_page(textpage)
+            else:
+                textpage = None
+                has_header, ends_table = False, False
+                may_hold_owners, has_details = known.get(page_num, (True, True))
+            wanted = may_hold_owners or (has_details and not details_found)
+            if wanted:
+                blocks = None
+                if use_words:
+                    words = page.get_text("words", textpage=textpage)    # type: ignore[attr-defined]
+                    records, columns = _parse_words(words, page_num + 1, columns)
+                else:
+                    blocks = page.get_text("blocks", textpage=textpage)    # type: ignore[attr-defined]
+                    records = _parse_blocks(blocks, page_num + 1)
+                details = {}
+                if not details_found and has_details:
+                    details = read_scheme_details(blocks or page.get_text("blocks", textpage=textpage))    # type: ignore[attr-defined]
+                    details_found = bool(details)
+        if wanted:
+            yield page_num, records, details, (may_hold_owners, has_details)
+        table_started = table_started or has_header or may_hold_owners
+        if table_started and ends_table:
+            break
+
+def _extract_pages(pdf_path: str, page_numbers: List[int], known: Optional[PageClasses], use_words: bool = False,
+                   columns: Optional[Columns] = None) -> Tuple[int, List[Dict[str, str]], Dict[str, str], List[Tuple], List[Tuple]]:
+    # Runs inside a worker process: each worker opens its own document by
+    # path because fitz.Document objects cannot be pickled. The scheme
+    # details, table pages found and page timings go back to the parent
+    # with the records, which get the details once every chunk is in.
+    import fitz  # PyMuPDF
+    with metrics.timed(metrics.PDF_OPEN):
+        doc = fitz.open(pdf_path)
+    try:
+        results = []
+        found_details = {}
+        table_pages = []
+        for page_num, records, details, page_class in _scan_pages(doc, page_numbers, known, use_words, columns):
+            table_pages.append((page_num, *page_class))
+            results.extend(records)
+            found_details = found_details or details
+        return page_numbers[0], results, found_details, table_pages, metrics.drain()
+    finally:
+        doc.close()
+
+def _with_details(records: List[Dict[str, str]], details: Dict[str, str]) -> List[Dict[str, str]]:
+    for rec in records:
+        rec.update(details)
+    return records
+
+def _shutdown_pool(pool: ProcessPoolExecutor, finished: bool):
+    # When the caller stops early (job cancelled, generator closed) or a chunk
+    # fails, queued chunks are dropped instead of being parsed for nothing
+    pool.shutdown(wait=finished, cancel_futures=not finished)
+
+def _page_chunks(page_numbers: List[int], workers: int) -> List[List[int]]:
+    chunk = max(MIN_PAGES_PER_WORKER, -(-len(page_numbers) // workers))
+    return [page_numbers[start:start + chunk] for start in range(0, len(page_numbers), chunk)]
+
+def _known_table_pages(pdf_path: str) -> Optional[PageClasses]:
+    """Pages read the last time this report was parsed, with their classes, if it has been."""
+    try:
+        entries = db.get_page_index(file_hash(pdf_path), CLASSIFIER_VERSION)
+    except (OSError, sqlite3.Error):
+        return None
+    if entries is None:
+        return None
+    return {page_num: (bool(may_hold_owners), bool(has_details)) for page_num, may_hold_owners, has_details in entries}
+
+def _store_table_pages(pdf_path: str, table_pages: List[Tuple[int, bool, bool]]):
+    try:
+        db.store_page_index(file_hash(pdf_path), CLASSIFIER_VERSION, sorted(table_pages))
+    except (OSError, sqlite3.Error):
+        pass
+
+# Report formats: name -> parser class, and name -> detector that says
+# from a report's first-page text whether it is in that format. Parsers
+# register with @register_parser; vendor packages can also add them under
+# the "aegis.pdf_parsers" entry point group, which is only read when a
+# format or report is not recognised by the built-in parsers.
+PARSERS: Dict[str, type] = {}
+DETECTORS: Dict[str, Callable[[str], bool]] = {}
+ENTRY_POINT_GROUP = "aegis.pdf_parsers"
+# format_type that picks the format from the report itself
+AUTO_FORMAT = "auto"
+# Parser used for auto when no detector recognises a report, as before detection existed
+DEFAULT_FORMAT = "lightstone"
+# Leading pages offered to the detectors; reports can open with cover or map pages
+DETECT_PAGES = 5
+_entry_points_loaded = False
+
+def register_parser(name: str, detect: Optional[Callable[[str], bool]] = None):
+    """
+    Class decorator adding a parser for format name. detect, if given, lets
+    format_type="auto" pick this parser for reports whose first-page text
+    it accepts. The class is created with workers and use_page_index.
+    """
+    def decorator(cls):
+        PARSERS[name.lower()] = cls
+        if detect:
+            DETECTORS[name.lower()] = detect
+        return cls
+    return decorator
+
+def _load_entry_points() -> bool:
+    """
+    Imports the parsers installed under ENTRY_POINT_GROUP, once. An entry
+    point may be a module that registers its parsers when imported, or a
+    parser class, registered under the entry point's name with its detect
+    attribute if it has one. Returns False if they were already loaded.
+    """
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return False
+    _entry_points_loaded = True
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            loaded = entry_point.load()
+        except Exception as e:
+            print(f"Could not load PDF parser {entry_point.name}: {e}")
+            continue
+        if isinstance(loaded, type) and entry_point.name.lower() not in PARSERS:
+            register_parser(entry_point.name, getattr(loaded, "detect", None))(loaded)
+    return True
 
 class PDFParser:
+    def __init__(self, workers: Optional[int] = 1, use_page_index: bool = True):
+        """
+        workers: number of processes used to extract pages. 1 keeps everything
+        in the calling process, None uses one process per CPU.
+        use_page_index: re-parses of a known report only read the pages that
+        held its owner table or scheme details last time.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.use_page_index = use_page_index
+
     def extract_data(self, pdf_path: str) -> List[Dict[str, str]]:
         raise NotImplementedError("Subclasses must implement extract_data")
 
+    def extract_many(self, pdf_paths: Iterable[str]) -> Iterator[Tuple[str, List[Dict[str, str]], Optional[Exception]]]:
+        """Yields (pdf_path, records, error) for each PDF, one after another."""
+        for pdf_path in pdf_paths:
+            try:
+                yield pdf_path, self.extract_data(pdf_path), None
+            except Exception as e:
+                yield pdf_path, [], e
+
+    def iter_records(self, pdf_path: str) -> Iterator[Dict[str, str]]:
+        """
+        Yields records one page at a time as the document is read, each with
+        its 1-based "page" number and the "block" index it was found in.
+        Unlike extract_data, finding nothing is not an error.
+        """
+        raise NotImplementedError("Subclasses must implement iter_records")
+
+def is_lightstone_report(text: str) -> bool:
+    return LIGHTSTONE_MARKER in text and TABLE_HEADER in text
+
+@register_parser("lightstone", detect=is_lightstone_report)
 class LightstonePDFParser(PDFParser):
+    # Rebuild rows from word positions instead of matching block text
+    use_words = False
+
+    def _pages_to_read(self, pdf_path: str, page_count: int) -> Tuple[List[int], Optional[PageClasses]]:
+        """(page numbers, their classes from the page index, or None when they still need classifying)"""
+        known = _known_table_pages(pdf_path) if self.use_page_index else None
+        if known is None:
+            return list(range(page_count)), None
+        return sorted(page_num for page_num in known if page_num < page_count), known
+
+    def _start_columns(self, doc, page_numbers: List[int]) -> Optional[Columns]:
+        """Table columns for workers whose pages come after the table header"""
+        return None
+
     def extract_data(self, pdf_path: str) -> List[Dict[str, str]]:
+        import fitz  # PyMuPDF
         try:
-            doc = fitz.open(pdf_path)
-            results = []
-
-            # Pattern matches: unit (digits), size (digits), name (words + spaces), identifier (13 digits)
-            pattern = re.compile(
-                r"(\d+)\s+(\d+)\s+([A-Z\s]+?)\s+(\d{13})"
-            )
-
-            for page in doc:
-                blocks = page.get_text("blocks")    # type: ignore[attr-defined]
-                for block in blocks:
-                    text = block[4].strip()
-                    matches = pattern.findall(text)
-                    for match in matches:
-                        unit, size, name, identifier = match
-                        results.append({
-                            "unit": unit,
-                            "size": size,
-                            "name": name.strip(),
-                            "identifier": identifier
-                        })
-
-            doc.close()
+            with fitz.open(pdf_path) as doc:
+                page_numbers, known = self._pages_to_read(pdf_path, doc.page_count)
+                pooled = self.workers > 1 and len(page_numbers) > MIN_PAGES_PER_WORKER
+                columns = self._start_columns(doc, page_numbers) if pooled else None
+            if pooled:
+                chunks = _page_chunks(page_numbers, self.workers)
+                table_pages = []
+                pool = ProcessPoolExecutor(max_workers=min(self.workers, len(chunks)), initializer=metrics.disable_auto_flush)
+                finished = False
+                try:
+                    futures = [pool.submit(_extract_pages, pdf_path, chunk, known, self.use_words, columns)
+                               for chunk in chunks]
+                    found = []
+                    for future in futures:
+                        _, records, details, pages, timings = future.result()
+                        found.append((records, details))
+                        table_pages.extend(pages)
+                        metrics.absorb(timings)
+                    finished = True
+                finally:
+                    _shutdown_pool(pool, finished)
+                # futures are in page order, so the first details found are the header's
+                details = next((details for _, details in found if details), {})
+                results = _with_details([rec for records, _ in found for rec in records], dict(empty_details(), **details))
+                if known is None and self.use_page_index:
+                    _store_table_pages(pdf_path, table_pages)
+            else:
+                results = list(self.iter_records(pdf_path))
 
             if not results:
                 raise ValueError("No matching data found in PDF.")
@@ -43,16 +443,268 @@ class LightstonePDFParser(PDFParser):
         except Exception as e:
             raise Exception(f"Error processing PDF: {str(e)}")
 
-def extract_data_from_pdf(pdf_path: str, format_type: str = "lightstone") -> List[Dict[str, str]]:
-    parsers = {
-        "lightstone": LightstonePDFParser()
-    }
+    def iter_records(self, pdf_path: str) -> Iterator[Dict[str, str]]:
+        # The scheme details come before the owner table, so they are known
+        # by the time the first record is yielded
+        import fitz  # PyMuPDF
+        with metrics.timed(metrics.PDF_OPEN):
+            doc = fitz.open(pdf_path)
+        try:
+            page_numbers, known = self._pages_to_read(pdf_path, doc.page_count)
+            table_pages = []
+            details = empty_details()
+            for page_num, records, page_details, page_class in _scan_pages(doc, page_numbers, known, self.use_words):
+                table_pages.append((page_num, *page_class))
+                details.update(page_details)
+                yield from _with_details(records, details)
+            # Only reached when the caller consumed the whole document
+            if known is None and self.use_page_index:
+                _store_table_pages(pdf_path, table_pages)
+        finally:
+            doc.close()
+
+    def extract_many(self, pdf_paths: Iterable[str]) -> Iterator[Tuple[str, List[Dict[str, str]], Optional[Exception]]]:
+        """
+        Extracts several PDFs, fanning both files and page ranges out across
+        one process pool. Yields (pdf_path, records, error) as each file
+        finishes, so the caller can start on the first report while the
+        rest are still being parsed. Records are always in page order.
+        """
+        pdf_paths = list(pdf_paths)
+        if self.workers <= 1:
+            yield from super().extract_many(pdf_paths)
+            return
 
-    parser = parsers.get(format_type.lower())
+        import fitz  # PyMuPDF
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=metrics.disable_auto_flush)
+        finished = False
+        try:
+            owners = {}       # future -> pdf_path
+            chunks = {}       # pdf_path -> {first_page: (records, details)}
+            remaining = {}    # pdf_path -> outstanding page chunks
+            table_pages = {}  # pdf_path -> owner-table pages found, None when already indexed
+            for pdf_path in pdf_paths:
+                try:
+                    with fitz.open(pdf_path) as doc:
+                        page_numbers, known = self._pages_to_read(pdf_path, doc.page_count)
+                        columns = self._start_columns(doc, page_numbers)
+                except Exception as e:
+                    yield pdf_path, [], Exception(f"Error processing PDF: {str(e)}")
+                    continue
+                if not page_numbers:
+                    yield pdf_path, [], Exception("Error processing PDF: No matching data found in PDF.")
+                    continue
+                file_chunks = _page_chunks(page_numbers, self.workers)
+                chunks[pdf_path] = {}
+                remaining[pdf_path] = len(file_chunks)
+                table_pages[pdf_path] = [] if known is None else None
+                for chunk in file_chunks:
+                    owners[pool.submit(_extract_pages, pdf_path, chunk, known, self.use_words, columns)] = pdf_path
+
+            for future in as_completed(owners):
+                pdf_path = owners[future]
+                if pdf_path not in remaining:
+                    continue  # an earlier chunk of this file already failed
+                try:
+                    first_page, records, details, pages, timings = future.result()
+                except Exception as e:
+                    del remaining[pdf_path]
+                    yield pdf_path, [], Exception(f"Error processing PDF: {str(e)}")
+                    continue
+                metrics.absorb(timings)
+                chunks[pdf_path][first_page] = (records, details)
+                if table_pages[pdf_path] is not None:
+                    table_pages[pdf_path].extend(pages)
+                remaining[pdf_path] -= 1
+                if remaining[pdf_path]:
+                    continue
+                del remaining[pdf_path]
+                if table_pages[pdf_path] is not None and self.use_page_index:
+                    _store_table_pages(pdf_path, table_pages[pdf_path])
+                by_page = chunks.pop(pdf_path)
+                file_chunks = [by_page[first_page] for first_page in sorted(by_page)]
+                details = next((details for _, details in file_chunks if details), {})
+                results = _with_details([rec for records, _ in file_chunks for rec in records], dict(empty_details(), **details))
+                if results:
+                    yield pdf_path, results, None
+                else:
+                    yield pdf_path, [], Exception("Error processing PDF: No matching data found in PDF.")
+            finished = True
+        finally:
+            _shutdown_pool(pool, finished)
+
+@register_parser("lightstone_words")
+class LightstoneWordsPDFParser(LightstonePDFParser):
+    """
+    Lightstone reports read by word position rather than block text, which
+    also finds co-owners and wrapped names that PyMuPDF puts in separate
+    blocks. Selected with format_type="lightstone_words"; auto-detection
+    picks the block parser.
+    """
+    use_words = True
+
+    def _start_columns(self, doc, page_numbers: List[int]) -> Optional[Columns]:
+        # Only the first table page has the column header, so pages handed
+        # to other workers start from the columns read here
+        header = table_columns(doc[page_numbers[0]].get_text("words")) if page_numbers else None
+        return header[0] if header else None
+
+@functools.lru_cache(maxsize=None)
+def _get_parser(format_type: str, workers: Optional[int] = 1, use_page_index: bool = True) -> PDFParser:
+    # One instance per format and settings, created on first use
+    if format_type.lower() not in PARSERS:
+        _load_entry_points()
+    parser = PARSERS.get(format_type.lower())
     if not parser:
         raise ValueError(f"Unsupported PDF format: {format_type}")
 
-    return parser.extract_data(pdf_path)
+    return parser(workers=workers, use_page_index=use_page_index)
+
+def _match_format(text: str) -> Optional[str]:
+    return next((name for name, detect in DETECTORS.items() if detect(text)), None)
+
+def _match_pages(doc) -> Optional[str]:
+    for page_num in range(min(doc.page_count, DETECT_PAGES)):
+        format_type = _match_format(doc[page_num].get_text())
+        if format_type:
+            return format_type
+    return None
+
+@functools.lru_cache(maxsize=256)
+def _detect_file(pdf_path: str, size: int, mtime_ns: int) -> str:
+    import fitz  # PyMuPDF
+    try:
+        with fitz.open(pdf_path) as doc:
+            format_type = _match_pages(doc)
+            if format_type is None and _load_entry_points():
+                format_type = _match_pages(doc)
+    except Exception as e:
+        raise Exception(f"Error processing PDF: {str(e)}")
+    if format_type is None:
+        raise ValueError(f"Error processing PDF: Unrecognised report format in {os.path.basename(pdf_path)}")
+    return format_type
+
+def detect_format(pdf_path: str) -> str:
+    """
+    Returns the registered format whose detector accepts one of the report's
+    first DETECT_PAGES pages. An unchanged file (same size and mtime) is
+    only looked at once.
+    """
+    try:
+        stat = os.stat(pdf_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+    return _detect_file(os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+
+def _resolve_format(pdf_path: str, format_type: str) -> str:
+    if format_type.lower() != AUTO_FORMAT:
+        return format_type.lower()
+    try:
+        return detect_format(pdf_path)
+    except ValueError:
+        # Unrecognised (e.g. the owner table starts after many cover pages):
+        # parse it the way every report was parsed before detection
+        return DEFAULT_FORMAT
+
+@functools.lru_cache(maxsize=256)
+def _hash_file(pdf_path: str, size: int, mtime_ns: int) -> str:
+    sha = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def file_hash(pdf_path: str) -> str:
+    """
+    SHA-256 of a report's contents. The parse cache, the page index and the
+    ingest markers all key on it; an unchanged file (same size and mtime) is
+    only read once per process.
+    """
+    stat = os.stat(pdf_path)
+    return _hash_file(os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+
+def _cache_lookup(pdf_path: str, format_type: str) -> Tuple[Optional[str], str, Optional[List[Dict[str, str]]]]:
+    """
+    Returns (content_hash, format_type, cached_records). The cache is keyed
+    by file contents, so a renamed copy of a report is still a hit. For the
+    auto format every detectable format is tried, so a cached report needs
+    no detection; format_type is the one that hit. Any problem reading the
+    file or the cache counts as a miss and parsing carries on.
+    """
+    format_type = format_type.lower()
+    try:
+        content_hash = file_hash(pdf_path)
+    except OSError:
+        CACHE_STATS["misses"] += 1
+        return None, format_type, None
+    for candidate in (list(DETECTORS) if format_type == AUTO_FORMAT else [format_type]):
+        try:
+            records = db.get_cached_parse(content_hash, candidate, PARSER_VERSION)
+        except sqlite3.Error:
+            records = None
+        if records:
+            CACHE_STATS["hits"] += 1
+            return content_hash, candidate, records
+    CACHE_STATS["misses"] += 1
+    return content_hash, format_type, None
+
+def _cache_store(content_hash: Optional[str], format_type: str, records: List[Dict[str, str]]):
+    if not content_hash or not records:
+        return
+    try:
+        db.store_parse(content_hash, format_type.lower(), PARSER_VERSION, records)
+    except sqlite3.Error:
+        pass
+
+def cache_stats() -> Dict[str, int]:
+    return dict(CACHE_STATS)
+
+def extract_data_from_pdf(pdf_path: str, format_type: str = AUTO_FORMAT, workers: Optional[int] = 1, use_cache: bool = True) -> List[Dict[str, str]]:
+    content_hash, records = None, None
+    if use_cache:
+        content_hash, format_type, records = _cache_lookup(pdf_path, format_type)
+        if records:
+            return records
+    format_type = _resolve_format(pdf_path, format_type)
+    records = _get_parser(format_type, workers, use_page_index=use_cache).extract_data(pdf_path)
+    _cache_store(content_hash, format_type, records)
+    return records
+
+def extract_many(pdf_paths: Iterable[str], format_type: str = AUTO_FORMAT, workers: Optional[int] = None, use_cache: bool = True) -> Iterator[Tuple[str, List[Dict[str, str]], Optional[Exception]]]:
+    # Cached reports are handed back straight away; only the rest reach the
+    # pool, one batch per format
+    misses = {}  # format -> {pdf_path: content_hash}
+    for pdf_path in pdf_paths:
+        content_hash, file_format, records = _cache_lookup(pdf_path, format_type) if use_cache else (None, format_type, None)
+        if records:
+            yield pdf_path, records, None
+            continue
+        try:
+            file_format = _resolve_format(pdf_path, file_format)
+        except Exception as e:
+            yield pdf_path, [], e
+            continue
+        misses.setdefault(file_format, {})[pdf_path] = content_hash
+    for file_format, hashes in misses.items():
+        parser = _get_parser(file_format, workers, use_page_index=use_cache)
+        for pdf_path, records, error in parser.extract_many(list(hashes)):
+            if not error:
+                _cache_store(hashes[pdf_path], file_format, records)
+            yield pdf_path, records, error
+
+def iter_records(pdf_path: str, format_type: str = AUTO_FORMAT, use_cache: bool = True) -> Iterator[Dict[str, str]]:
+    content_hash, records = None, None
+    if use_cache:
+        content_hash, format_type, records = _cache_lookup(pdf_path, format_type)
+        if records:
+            yield from records
+            return
+    format_type = _resolve_format(pdf_path, format_type)
+    records = []
+    for rec in _get_parser(format_type, use_page_index=use_cache).iter_records(pdf_path):
+        records.append(rec)
+        yield rec
+    _cache_store(content_hash, format_type, records)
 
 def main():
     try:
@@ -0,0 +1,171 @@
+# stub_virtual_agent.py
+"""
+Local stand-in for the Virtual Agent site, for exercising virtual_agent_scraper
+without spending credits. Serves the sign-in page, the person search page and a
+contact view (/person/<id>/contact, also reached from the search form) with
+made-up numbers derived from the ID, shown as links. Pages pull in a logo,
+a web font and a slow "analytics" script from another host (localhost instead
+of 127.0.0.1), like the real site, so request blocking can be measured.
+
+Run it and point the scraper at it:
+    python stub_virtual_agent.py
+    scrape_phones_for_ids(ids, "user", "pass", base_url="http://127.0.0.1:8765")
+
+Add "localhost" to virtual_agent_scraper.BLOCKED_HOSTS to block the script.
+"""
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import urlparse, parse_qs
+
+SESSION_COOKIE = "va_session=stub"
+
+PAGE = """<html><head>
+<link rel="stylesheet" href="/static/site.css">
+<script async src="http://localhost:{port}/collect.js"></script>
+</head><body>
+<img src="/static/logo.png" alt="">
+{body}
+</body></html>"""
+
+SIGN_IN_FORM = """<form method="post" action="/user/sign-in">
+  <input name="username" aria-label="Enter Address">
+  <input name="password" type="password" aria-label="Password">
+  <button type="submit">Sign In</button>
+</form>"""
+
+SEARCH_FORM = """<div id="tab_person_search">
+  <form method="get" action="/search">
+    <input name="id">
+    <button type="submit">Search</button>
+  </form>
+</div>"""
+
+# A person's contact view, reachable from the search form or directly
+CONTACT_ROUTE = re.compile(r"/person/(\d+)/contact")
+
+SITE_CSS = "@font-face { font-family: Brand; src: url(/static/brand.woff2); } body { font-family: Brand, sans-serif; }"
+
+# path -> (content type, body); sizes roughly those of a real logo and web font
+ASSETS = {
+    "/static/site.css": ("text/css", SITE_CSS.encode("ascii")),
+    "/static/logo.png": ("image/png", bytes(120_000)),
+    "/static/brand.woff2": ("font/woff2", bytes(80_000)),
+    "/collect.js": ("application/javascript", b"/* analytics */"),
+}
+# The analytics script answers this late, keeping the network busy after the page is usable
+TRACKER_LATENCY = 0.5
+
+def stub_numbers(id_value: str) -> List[str]:
+    # IDs ending in 0 have no numbers on file, the rest get up to three
+    if id_value.endswith("0"):
+        return []
+    count = int(id_value[-1]) % 3 + 1
+    return [f"0{(int(id_value[-9:]) + i) % 10**9:09d}" for i in range(count)]
+
+def contact_row(number: str) -> str:
+    # Written the way the site shows them, next to links that are not numbers
+    shown = f"({number[:3]}) {number[3:6]}-{number[6:]}"
+    return (f"<tr><td>Cell</td><td><a href=\"tel:{number}\">{shown}</a></td>"
+            f"<td><a href=\"mailto:owner@example.com\">owner@example.com</a></td><td><a href=\"#\">Edit</a></td></tr>")
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Simulated server time per page, to make concurrency measurable
+    latency = 0.0
+    # False answers contact views opened without going through the search form with 404
+    deep_links = True
+    requests_served: Dict[str, int] = {}
+    bytes_served = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self, path: str):
+        StubHandler.requests_served[path] = StubHandler.requests_served.get(path, 0) + 1
+
+    def _send(self, body: str, status: int = 200, headers: Dict[str, str] = None,
+              content_type: str = "text/html; charset=utf-8", data: bytes = None):
+        if data is None:
+            data = body.encode("utf-8")
+        StubHandler.bytes_served += len(data)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _redirect(self, location: str, headers: Dict[str, str] = None):
+        self._send("", status=302, headers=dict(headers or {}, Location=location))
+
+    def _page(self, body: str) -> str:
+        return PAGE.format(port=self.server.server_port, body=body)
+
+    def _signed_in(self) -> bool:
+        return SESSION_COOKIE in self.headers.get("Cookie", "")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        self._count(url.path)
+        if url.path == "/user/sign-in":
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self._redirect("/", {"Set-Cookie": f"{SESSION_COOKIE}; Path=/"})
+        else:
+            self._send("Not found", status=404)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self._count(url.path)
+        if url.path in ASSETS:
+            if url.path == "/collect.js":
+                time.sleep(TRACKER_LATENCY)
+            content_type, data = ASSETS[url.path]
+            self._send("", headers={"Cache-Control": "max-age=3600"}, content_type=content_type, data=data)
+            return
+        if self.latency:
+            time.sleep(self.latency)
+        if url.path == "/user/sign-in":
+            self._send(self._page(SIGN_IN_FORM))
+        elif not self._signed_in():
+            self._redirect("/user/sign-in")
+        elif url.path == "/":
+            self._send(self._page(SEARCH_FORM))
+        elif url.path == "/search":
+            # The search form lands on the person's contact view
+            id_value = parse_qs(url.query).get("id", [""])[0]
+            self._redirect(f"/person/{id_value}/contact")
+        elif CONTACT_ROUTE.fullmatch(url.path):
+            if not self.deep_links and not self.headers.get("Referer"):
+                self._send("Not found", status=404)
+                return
+            id_value = CONTACT_ROUTE.fullmatch(url.path).group(1)
+            rows = "".join(contact_row(n) for n in stub_numbers(id_value))
+            self._send(self._page(f"{SEARCH_FORM}<table id=\"DataTables_Table_0\">{rows}</table>"))
+        else:
+            self._send("Not found", status=404)
+
+def serve(port: int = 0, latency: float = 0.0, deep_links: bool = True) -> ThreadingHTTPServer:
+    """
+    Starts the stub on a background thread; port 0 picks a free port.
+    deep_links=False makes contact views only reachable through the search form.
+    Call .shutdown() on the returned server when done.
+    """
+    StubHandler.latency = latency
+    StubHandler.deep_links = deep_links
+    StubHandler.requests_served = {}
+    StubHandler.bytes_served = 0
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    server = serve(8765, latency=0.5)
+    print(f"Stub Virtual Agent running on http://127.0.0.1:{server.server_port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
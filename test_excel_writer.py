@@ -2,7 +2,7 @@ import openpyxl
 from datetime import datetime
 import os
 import logging
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from openpyxl.styles import Font, PatternFill, Border, Side, Alignment, NamedStyle
 from openpyxl.utils import get_column_letter
 
 # Configure logging for debugging
@@ -32,15 +32,17 @@ def create_excel_file(scheme_number, data, output_file=None):
         assert ws is not None  # Address Pylance warning
         ws.title = "Aegis Report"
 
-        # Define styles
-        header_font = Font(bold=True, size=12, color="FFFFFF")
-        title_font = Font(bold=True, size=14)
-        cell_font = Font(size=11)
-        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+        # Define styles once as named styles; cells only reference them by name
         thin_border = Border(left=Side(style="thin"), right=Side(style="thin"),
                              top=Side(style="thin"), bottom=Side(style="thin"))
         center_align = Alignment(horizontal="center", wrap_text=True)
-        padding_align = Alignment(horizontal="center", wrap_text=True)
+        wb.add_named_style(NamedStyle(name="title", font=Font(bold=True, size=14),
+                                      border=thin_border, alignment=center_align))
+        wb.add_named_style(NamedStyle(name="header", font=Font(bold=True, size=12, color="FFFFFF"),
+                                      fill=PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid"),
+                                      border=thin_border, alignment=center_align))
+        wb.add_named_style(NamedStyle(name="cell", font=Font(size=11),
+                                      border=thin_border, alignment=center_align))
 
         # Get the current system date and time (05:52 PM SAST, 2025-06-07)
         current_date = datetime.now().strftime("%Y-%m-%d %I:%M %p SAST")
@@ -48,17 +50,13 @@ def create_excel_file(scheme_number, data, output_file=None):
         # Write and format the report date in cell A1, merged across A1:E1
         ws.merge_cells("A1:E1")
         ws["A1"] = f"Report Date: {current_date}"
-        ws["A1"].font = title_font
-        ws["A1"].alignment = center_align
-        ws["A1"].border = thin_border
+        ws["A1"].style = "title"
         ws.row_dimensions[1].height = 25  # Increased height for better spacing
 
         # Write and format the Sectional Scheme Number in cell A2, merged across A2:E2
         ws.merge_cells("A2:E2")
         ws["A2"] = scheme_number
-        ws["A2"].font = title_font
-        ws["A2"].alignment = center_align
-        ws["A2"].border = thin_border
+        ws["A2"].style = "title"
         ws.row_dimensions[2].height = 25  # Increased height for better spacing
 
         # Write and format the column headers in row 3
@@ -66,12 +64,12 @@ def create_excel_file(scheme_number, data, output_file=None):
         for col, header in enumerate(headers, start=1):
             cell = ws.cell(row=3, column=col)
             cell.value = header
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = thin_border
-            cell.alignment = center_align
+            cell.style = "header"
         ws.row_dimensions[3].height = 22  # Increased height for headers
 
+        # Column widths are tracked while rows are written instead of rescanning every cell afterwards
+        max_lengths = [len(header) for header in headers]
+
         # Write the data starting from row 4
         for row_idx, entry in enumerate(data, start=4):
             if not isinstance(entry, dict):
@@ -87,24 +85,16 @@ def create_excel_file(scheme_number, data, output_file=None):
             for col_idx, value in enumerate(row_data, start=1):
                 cell = ws.cell(row=row_idx, column=col_idx)
                 cell.value = value
-                cell.font = cell_font
-                cell.border = thin_border
-                cell.alignment = padding_align
+                cell.style = "cell"
+                if value:
+                    max_lengths[col_idx - 1] = max(max_lengths[col_idx - 1], len(str(value)))
             ws.row_dimensions[row_idx].height = 20  # Increased height for data rows
 
         # Auto-adjust column widths for columns A to E with minimum and maximum constraints
-        for col in range(1, 6):  # Columns A to E
-            max_length = 0
-            column = get_column_letter(col)
-            for cell in ws[column]:
-                try:
-                    if cell.value and len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
+        for col, max_length in enumerate(max_lengths, start=1):
             adjusted_width = max(max_length + 4, 10)  # Minimum width 10, add padding
             adjusted_width = min(adjusted_width, 20)  # Maximum width 20 to avoid excessive space
-            ws.column_dimensions[column].width = adjusted_width
+            ws.column_dimensions[get_column_letter(col)].width = adjusted_width
 
         # Ensure the output directory exists
         os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
@@ -0,0 +1,291 @@
+"""
+Tests for virtual_agent_scraper. Error classification and rate limiting are
+tested directly, and learning/forgetting the contact route on a fake page;
+whole lookups run a real Chromium against the local stub
+(stub_virtual_agent.py) and are skipped when Chromium is not installed.
+Run with: python -m pytest test_virtual_agent_scraper.py
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+import pytest
+import db
+import stub_virtual_agent
+import virtual_agent_scraper as scraper
+from stub_virtual_agent import StubHandler, stub_numbers
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    # A throwaway database, session folder and learned-route file per test
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "test.db"))
+    monkeypatch.setattr(scraper, "SESSION_DIR", str(tmp_path / "sessions"))
+    monkeypatch.setattr(scraper, "CONTACT_ROUTES_FILE", str(tmp_path / "sessions" / "contact_routes.json"))
+    monkeypatch.setattr(scraper, "_contact_routes", None)
+    monkeypatch.setattr(scraper, "_broken_routes", set())
+    monkeypatch.setattr(scraper, "retry_delay", lambda attempt: 0.05)
+    db.ensure_db()
+    yield
+    db.close_conn()
+
+@pytest.fixture(scope="module")
+def chromium():
+    pytest.importorskip("playwright")
+
+    async def launch():
+        from playwright.async_api import async_playwright
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            await browser.close()
+    try:
+        asyncio.run(launch())
+    except Exception as e:
+        pytest.skip(f"Chromium is not available: {e}")
+
+@pytest.fixture
+def stub():
+    """Starts the stub site; returns its base URL."""
+    servers = []
+
+    def start(latency: float = 0.0, deep_links: bool = True) -> str:
+        server = stub_virtual_agent.serve(latency=latency, deep_links=deep_links)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def attempts(monkeypatch):
+    """Counts the lookups made per ID."""
+    counts = {}
+    lookup = scraper._lookup
+
+    async def counted(page, id_value, base_url):
+        counts[id_value] = counts.get(id_value, 0) + 1
+        return await lookup(page, id_value, base_url)
+    monkeypatch.setattr(scraper, "_lookup", counted)
+    return counts
+
+SITE = "https://agent.example"
+# Link texts in a fake contact table, and the numbers they hold
+CONTACT_LINKS = ["(082) 123-4567", "owner@example.com", "Edit"]
+CONTACT_NUMBERS = ["0821234567"]
+
+class FakeResponse:
+    def __init__(self, status: int):
+        self.status = status
+        self.ok = 200 <= status < 300
+
+class FakeLocator:
+    def __init__(self, page):
+        self.page = page
+
+    async def evaluate(self, script, timeout=None):
+        if self.page.table is None:
+            raise Exception(f"Timeout {timeout}ms exceeded.")
+        return self.page.table
+
+    async def count(self):
+        return 0 if self.page.table is None else 1
+
+class FakePage:
+    """
+    Just enough of a Playwright page for _lookup: the search form lands on
+    /person/<id>/contact; opening that URL directly answers link_status, or
+    raises link_error, or shows no table when link_table is False.
+    """
+    def __init__(self, link_status: int = 200, link_table: bool = True, link_error: Exception = None,
+                 signed_out: bool = False):
+        self.link_status = link_status
+        self.link_table = link_table
+        self.link_error = link_error
+        self.signed_out = signed_out
+        self.url = SITE + scraper.SEARCH_PATH
+        self.table = None
+        self.searches = 0
+        self.deep_links = 0
+        self._typed = None
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        self.table = None
+        if "/person/" not in url:
+            self.url = url
+            return FakeResponse(200)
+        self.deep_links += 1
+        if self.link_error:
+            raise self.link_error
+        if self.signed_out:
+            self.url = SITE + scraper.SIGN_IN_PATH
+            return FakeResponse(200)
+        self.url = url
+        if self.link_status == 200 and self.link_table:
+            self.table = CONTACT_LINKS
+        return FakeResponse(self.link_status)
+
+    async def fill(self, selector, value):
+        self._typed = value
+
+    async def click(self, selector):
+        self.searches += 1
+        self.url = f"{SITE}/person/{self._typed}/contact"
+        self.table = CONTACT_LINKS
+
+    @asynccontextmanager
+    async def expect_navigation(self, **kwargs):
+        yield
+
+    def locator(self, selector):
+        return FakeLocator(self)
+
+    async def evaluate(self, script):
+        return "complete"
+
+def lookup(page, id_value):
+    return asyncio.run(scraper._lookup(page, id_value, SITE))
+
+def scrape(ids, base_url, **kwargs):
+    kwargs.setdefault("rate_per_second", 0)
+    kwargs.setdefault("cache_ttl_days", None)
+    return scraper.scrape_phones_for_ids(ids, "user", "pass", base_url=base_url, **kwargs)
+
+def test_classify_error():
+    assert scraper.classify_error(scraper.SessionExpired("redirected")) == scraper.FATAL
+    assert scraper.classify_error(Exception("Target page, context or browser has been closed")) == scraper.FATAL
+    assert scraper.classify_error(asyncio.TimeoutError()) == scraper.TRANSIENT
+    assert scraper.classify_error(ConnectionError("Contact view returned HTTP 503")) == scraper.TRANSIENT
+    assert scraper.classify_error(Exception("Timeout 30000ms exceeded.")) == scraper.TRANSIENT
+    assert scraper.classify_error(Exception("page.goto: net::ERR_CONNECTION_RESET")) == scraper.TRANSIENT
+    assert scraper.classify_error(Exception('Element not found: input[name="id"]')) == scraper.PERMANENT
+
+def test_rate_limiter_spaces_out_starts():
+    async def starts(rate, count):
+        limiter = scraper.RateLimiter(rate)
+        began = time.monotonic()
+        await asyncio.gather(*(limiter.wait() for _ in range(count)))
+        return time.monotonic() - began
+    assert asyncio.run(starts(20, 5)) >= 4 / 20 - 0.01
+    assert asyncio.run(starts(0, 5)) < 0.05
+
+def test_search_lookup_learns_the_contact_route():
+    page = FakePage()
+    assert lookup(page, "8001015000001") == CONTACT_NUMBERS
+    assert scraper.contact_route(SITE) == "/person/{id}/contact"
+    assert lookup(page, "8001015000002") == CONTACT_NUMBERS
+    assert (page.searches, page.deep_links) == (1, 1)
+    assert page.url == f"{SITE}/person/8001015000002/contact"
+
+@pytest.mark.parametrize("page", [FakePage(link_status=404), FakePage(link_table=False)], ids=["http-404", "no-table"])
+def test_wrong_route_is_forgotten(page):
+    scraper.learn_contact_route(SITE, f"{SITE}/person/8001015000001/contact", "8001015000001")
+    assert lookup(page, "8001015000002") == CONTACT_NUMBERS
+    assert page.searches == 1
+    # Not learned again from the search that followed, nor by later lookups
+    assert scraper.contact_route(SITE) is None
+    assert lookup(page, "8001015000003") == CONTACT_NUMBERS
+    assert (page.searches, page.deep_links) == (2, 1)
+
+@pytest.mark.parametrize("page", [
+    FakePage(link_status=503),
+    FakePage(link_error=Exception("page.goto: Timeout 10000ms exceeded.")),
+    FakePage(link_error=Exception("page.goto: net::ERR_CONNECTION_RESET")),
+], ids=["http-503", "timeout", "network"])
+def test_route_survives_transient_failures(page):
+    scraper.learn_contact_route(SITE, f"{SITE}/person/8001015000001/contact", "8001015000001")
+    assert lookup(page, "8001015000002") == CONTACT_NUMBERS
+    assert page.searches == 1
+    assert scraper.contact_route(SITE) == "/person/{id}/contact"
+
+def test_expired_session_on_deep_link_is_fatal():
+    scraper.learn_contact_route(SITE, f"{SITE}/person/8001015000001/contact", "8001015000001")
+    page = FakePage(signed_out=True)
+    with pytest.raises(scraper.SessionExpired) as raised:
+        lookup(page, "8001015000002")
+    assert scraper.classify_error(raised.value) == scraper.FATAL
+    assert page.searches == 0
+    assert scraper.contact_route(SITE) == "/person/{id}/contact"
+
+def test_lookups_run_concurrently(chromium, stub):
+    latency = 0.5
+    base_url = stub(latency=latency)
+    ids = [f"80010150000{n:02d}" for n in range(1, 9)]
+    began = time.monotonic()
+    results = scrape(ids, base_url, concurrency=4)
+    elapsed = time.monotonic() - began
+    assert results == {id_value: stub_numbers(id_value) for id_value in ids}
+    # Every lookup costs at least one slow page, so one page alone would take this long
+    assert elapsed < len(ids) * latency
+    # Signed in once; the other pages share the session
+    assert StubHandler.requests_served["/user/sign-in"] == 2  # the form, then the post
+
+def test_transient_failures_are_retried(chromium, stub, attempts, monkeypatch):
+    base_url = stub()
+    monkeypatch.setattr(scraper, "LOOKUP_TIMEOUT_MS", 1000)
+    monkeypatch.setattr(scraper, "DEEP_LINK_TIMEOUT_MS", 1000)
+    slow_id = "8001015000081"
+    do_get = StubHandler.do_GET
+
+    def first_view_times_out(handler):
+        if handler.path == f"/person/{slow_id}/contact" and StubHandler.requests_served.get(handler.path, 0) == 0:
+            time.sleep(2)
+        do_get(handler)
+    monkeypatch.setattr(StubHandler, "do_GET", first_view_times_out)
+    failures = {}
+    ids = [slow_id, "8001015000082"]
+    results = scrape(ids, base_url, on_failure=lambda id_value, e: failures.setdefault(id_value, e))
+    assert results == {id_value: stub_numbers(id_value) for id_value in ids}
+    assert failures == {}
+    assert attempts == {slow_id: 2, "8001015000082": 1}
+
+def test_lookups_give_up_after_max_attempts(chromium, stub, attempts, monkeypatch):
+    base_url = stub(deep_links=False)
+    monkeypatch.setattr(scraper, "LOOKUP_TIMEOUT_MS", 1000)
+    missing_id = "8001015000091"
+    do_get = StubHandler.do_GET
+
+    def contact_view_missing(handler):
+        if handler.path == f"/person/{missing_id}/contact":
+            handler._count(handler.path)
+            handler._send(handler._page("No contact details"))
+        else:
+            do_get(handler)
+    monkeypatch.setattr(StubHandler, "do_GET", contact_view_missing)
+    failures = {}
+    results = scrape([missing_id, "8001015000092"], base_url, max_attempts=2,
+                     on_failure=lambda id_value, e: failures.setdefault(id_value, e))
+    assert list(results) == ["8001015000092"]
+    assert list(failures) == [missing_id]
+    assert scraper.classify_error(failures[missing_id]) == scraper.TRANSIENT
+    assert attempts[missing_id] == 2
+
+def test_session_expiry_stops_every_page(chromium, stub, monkeypatch):
+    base_url = stub()
+    signed_in = StubHandler._signed_in
+    expired = []
+    monkeypatch.setattr(StubHandler, "_signed_in", lambda handler: not expired and signed_in(handler))
+    ids = [f"80010150001{n:02d}" for n in range(1, 21)]
+    answered, failures = [], []
+
+    def on_result(id_value, numbers, from_cache):
+        answered.append(id_value)
+        expired.append(True)  # the site signs the agent out after the first lookup
+    with pytest.raises(scraper.SessionExpired):
+        scrape(ids, base_url, concurrency=2, on_result=on_result,
+               on_failure=lambda id_value, e: failures.append(id_value))
+    assert 1 <= len(answered) < len(ids)
+    assert failures == []
+
+def test_deep_links_skip_the_search_form(chromium, stub):
+    base_url = stub()
+    ids = [f"80010150002{n:02d}" for n in range(1, 5)]
+    assert scrape(ids, base_url) == {id_value: stub_numbers(id_value) for id_value in ids}
+    assert StubHandler.requests_served["/search"] == 1
+    assert scraper.contact_route(base_url) == "/person/{id}/contact"
+
+def test_unreachable_deep_links_fall_back_to_the_search_form(chromium, stub):
+    base_url = stub(deep_links=False)
+    ids = [f"80010150003{n:02d}" for n in range(1, 5)]
+    assert scrape(ids, base_url) == {id_value: stub_numbers(id_value) for id_value in ids}
+    # The route learned from the first search 404s once and is then left alone
+    assert StubHandler.requests_served["/search"] == len(ids)
+    assert scraper.contact_route(base_url) is None
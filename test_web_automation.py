@@ -1,10 +1,16 @@
 import os
-import re
 from dotenv import load_dotenv
 from playwright.sync_api import Page, TimeoutError, expect
 from playwright.sync_api import sync_playwright
 import time
 import random
+from virtual_agent_scraper import (
+    BASE_URL, CONTACT_LINKS_JS, CONTACT_TABLE_SELECTOR, contact_route, contact_url, forget_contact_route,
+    learn_contact_route, normalize_phone_numbers, session_path, should_block
+)
+
+# Login storage state shared with the scraper, reused across runs
+SESSION_FILE = session_path("test_web_automation")
 
 def extract_phone_numbers(page: Page) -> list:
     """
@@ -14,23 +20,17 @@ def extract_phone_numbers(page: Page) -> list:
     try:
         print("Extracting phone numbers from contact table...")
 
-        contact_table = page.locator("#DataTables_Table_0")
+        contact_table = page.locator(CONTACT_TABLE_SELECTOR)
         contact_table.wait_for(timeout=10000)
 
-        links_in_table = contact_table.get_by_role("link").all()
+        # All link texts in one round trip, then cleaned and validated together
+        links_in_table = contact_table.evaluate(CONTACT_LINKS_JS)
 
         print(f"Found {len(links_in_table)} links in the table to check.")
 
-        for link in links_in_table:
-            if len(phone_numbers) >= 3:
-                break
-
-            number_text = link.inner_text().strip()
-            cleaned_number = re.sub(r'[\s\(\)-]', '', number_text)
-
-            if re.match(r"^0[0-9]{9}$", cleaned_number):
-                phone_numbers.append(cleaned_number)
-                print(f"    -> Valid number found: {cleaned_number}")
+        phone_numbers = normalize_phone_numbers(links_in_table)
+        for number in phone_numbers:
+            print(f"    -> Valid number found: {number}")
 
         print(f"Finished search. Found {len(phone_numbers)} valid phone numbers.")
     except TimeoutError:
@@ -41,57 +41,121 @@ def extract_phone_numbers(page: Page) -> list:
     return phone_numbers
 
 
-def test_virtual_agent(page: Page, username: str, password: str) -> dict:
+def block_unneeded_requests(route):
     """
-    This version navigates directly to the sign-in page and waits for elements to appear.
+    Route handler that aborts images, fonts and tracking requests, using the
+    same allow/deny lists as the scraper.
     """
-    result = {"status": "error", "message": "Unknown error", "phone_numbers": []}
+    if should_block(route.request.url, route.request.resource_type):
+        route.abort()
+    else:
+        route.continue_()
+
 
+def session_is_live(page: Page) -> bool:
+    """
+    Opens the dashboard with whatever session the context was created with.
+    An expired (or missing) session is redirected to the sign-in page.
+    """
+    if not os.path.exists(SESSION_FILE):
+        return False
+    page.goto(BASE_URL + "/")
+    if "/user/sign-in" in page.url:
+        return False
     try:
-        print("Navigating directly to sign-in page...")
-        page.goto("https://app.thevirtualagent.co.za/user/sign-in")
+        page.locator("#tab_person_search").wait_for(timeout=5000)
+        return True
+    except TimeoutError:
+        return False
 
-        print("Waiting for page to load and filling login credentials...")
-        page.wait_for_load_state("domcontentloaded")
 
-        page.get_by_role("textbox", name="Enter Address").fill(username)
-        page.get_by_role("textbox", name="Password").fill(password)
+def open_contact_view(page: Page, id_number: str) -> bool:
+    """
+    Opens the contact view for id_number in one navigation, using the route
+    learned by an earlier click-through. False if there is none or it failed.
+    """
+    template = contact_route(BASE_URL)
+    if not template:
+        return False
+    print("Opening contact view directly...")
+    route_is_wrong = False
+    try:
+        response = page.goto(contact_url(BASE_URL, template, id_number), wait_until="domcontentloaded")
+        if response is not None and not response.ok:
+            # 4xx means the route is wrong; a server error may be passing
+            route_is_wrong = 400 <= response.status < 500 and response.status not in (408, 429)
+            raise ValueError(f"HTTP {response.status}")
+        try:
+            page.locator(CONTACT_TABLE_SELECTOR).wait_for(timeout=10000)
+        except TimeoutError:
+            # A page that finished loading without the table is the wrong page, not a slow one
+            route_is_wrong = (page.evaluate("document.readyState") == "complete"
+                              and page.locator(CONTACT_TABLE_SELECTOR).count() == 0)
+            raise
+        return True
+    except Exception as e:
+        print(f"Direct link failed ({e}); falling back to the click-through.")
+        if route_is_wrong:
+            forget_contact_route(BASE_URL)
+        page.goto(BASE_URL + "/")
+        return False
 
-        print("Clicking Sign In...")
-        page.get_by_role("button", name="Sign In").click()
 
-        # Small wait to mimic human pause and let transition settle
-        page.wait_for_timeout(1500)
+def click_through_to_contact_view(page: Page, id_number: str):
+    """Dashboard -> View Sample -> ID -> Contact tab, waiting on each element rather than fixed pauses."""
+    print("Following original 'View Sample' workflow...")
+    view_sample = page.locator("#tab_person_search").get_by_text("View Sample")
+    expect(view_sample).to_be_visible(timeout=10000)
+    view_sample.click()
 
-        print("Waiting for dashboard to load after login...")
-        page.locator("#tab_person_search").wait_for(timeout=30000)
+    print(f"Waiting for sample ID link '{id_number}' to be visible...")
+    id_link = page.get_by_role("link", name=id_number)
+    expect(id_link).to_be_visible(timeout=30000)
+    id_link.click()
 
-        print("Login successful. Following original 'View Sample' workflow...")
-        view_sample = page.locator("#tab_person_search").get_by_text("View Sample")
-        expect(view_sample).to_be_visible(timeout=10000)
-        view_sample.click()
+    print("Navigating to Contact section...")
+    contact_tab = page.get_by_role("link", name=" Contact")
+    expect(contact_tab).to_be_visible(timeout=10000)
+    contact_tab.click()
 
-        # Human-like pause
-        page.wait_for_timeout(1200)
+    # Wait for the contact table to be present before extracting
+    page.locator(CONTACT_TABLE_SELECTOR).wait_for(timeout=10000)
 
-        print("Selecting sample ID...")
-        id_number = "6211141234083"
-        id_link = page.get_by_role("link", name=id_number)
 
-        print(f"Waiting for sample ID link '{id_number}' to be visible...")
-        expect(id_link).to_be_visible(timeout=30000)
-        id_link.click()
+def test_virtual_agent(page: Page, username: str, password: str) -> dict:
+    """
+    This version navigates directly to the sign-in page and waits for elements to appear.
+    """
+    result = {"status": "error", "message": "Unknown error", "phone_numbers": []}
 
-        # Slight pause to mimic loading transition
-        page.wait_for_timeout(1000)
+    try:
+        if session_is_live(page):
+            print("Saved session is still valid, skipping sign-in.")
+        else:
+            print("Navigating directly to sign-in page...")
+            page.goto(BASE_URL + "/user/sign-in")
+
+            print("Waiting for page to load and filling login credentials...")
+            page.wait_for_load_state("domcontentloaded")
+
+            page.get_by_role("textbox", name="Enter Address").fill(username)
+            page.get_by_role("textbox", name="Password").fill(password)
 
-        print("Navigating to Contact section...")
-        contact_tab = page.get_by_role("link", name=" Contact")
-        expect(contact_tab).to_be_visible(timeout=10000)
-        contact_tab.click()
+            print("Clicking Sign In...")
+            page.get_by_role("button", name="Sign In").click()
 
-        # Wait for the contact table to be present before extracting
-        page.locator("#DataTables_Table_0").wait_for(timeout=10000)
+            print("Waiting for dashboard to load after login...")
+            page.locator("#tab_person_search").wait_for(timeout=30000)
+
+            print("Saving session for the next run...")
+            os.makedirs(os.path.dirname(SESSION_FILE), exist_ok=True)
+            page.context.storage_state(path=SESSION_FILE)
+
+        id_number = "6211141234083"
+        if not open_contact_view(page, id_number):
+            click_through_to_contact_view(page, id_number)
+            # Next time the contact view can be opened in a single navigation
+            learn_contact_route(BASE_URL, page.url, id_number)
 
         phone_numbers = extract_phone_numbers(page)
 
@@ -158,8 +222,10 @@ if __name__ == "__main__":
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
             viewport={'width': 1920, 'height': 1080},
             locale='en-US',
-            java_script_enabled=True
+            java_script_enabled=True,
+            storage_state=SESSION_FILE if os.path.exists(SESSION_FILE) else None
         )
+        context.route("**/*", block_unneeded_requests)
 
         page = context.new_page()
 
@@ -1,43 +1,587 @@
 # virtual_agent_scraper.py
 """
 Automates interaction with https://app.thevirtualagent.co.za/user/sign-in using Playwright.
-Exports: scrape_phones_for_ids(ids: List[str], username: str, password: str) -> Dict[str, List[str]]
+Exports: scrape_phones_for_ids(ids: List[str], username: str, password: str, concurrency: int = 1) -> Dict[str, List[str]]
+         scrape_phone_batches(batches: Iterable[List[str]], username: str, password: str, concurrency: int = 1) -> Dict[str, List[str]]
 """
-from typing import List, Dict
-from playwright.sync_api import sync_playwright
+import asyncio
+import json
+import os
+import random
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+import db
+import metrics
 
-def scrape_phones_for_ids(ids: List[str], username: str, password: str) -> Dict[str, List[str]]:
+BASE_URL = "https://app.thevirtualagent.co.za"
+SIGN_IN_PATH = "/user/sign-in"
+SEARCH_PATH = "/"  # page holding the ID search form after login
+# Only present once signed in; used to tell a live session from an expired one
+SIGNED_IN_SELECTOR = "#tab_person_search"
+# The contact table a lookup reads its numbers from
+CONTACT_TABLE_SELECTOR = "#DataTables_Table_0"
+# How long a lookup waits for its page and table
+LOOKUP_TIMEOUT_MS = 30000
+# Runs in the page and returns the text of every link in the contact table,
+# in one round trip instead of one per link
+CONTACT_LINKS_JS = """table => Array.from(
+    table.querySelectorAll('a[href], [role="link"]'),
+    link => link.innerText
+)"""
+# Phone numbers the site lists are 10 digits starting with 0, possibly
+# written with spaces, brackets or dashes
+PHONE_NUMBER = re.compile(r"0[0-9]{9}", re.ASCII)
+PHONE_NOISE = re.compile(r"[\s()\-]")
+# Numbers kept per ID
+MAX_PHONE_NUMBERS = 3
+
+# Requests the lookups never need are aborted before they leave the browser.
+# Read when each context is created, so they can be changed at runtime.
+BLOCK_REQUESTS = True
+BLOCKED_RESOURCE_TYPES = ("image", "media", "font")
+# Analytics and tracking hosts (subdomains included)
+BLOCKED_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "facebook.com", "hotjar.com", "clarity.ms", "newrelic.com", "nr-data.net",
+)
+# Always let through, whatever the lists above say
+ALLOWED_HOSTS = ()
+# Running totals of the requests seen by the route handler
+REQUEST_STATS = {"blocked": 0, "allowed": 0}
+
+# Saved Playwright storage state (cookies + local storage), one file per agent
+SESSION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions")
+# How long to wait for the dashboard when trying a saved session
+SESSION_CHECK_TIMEOUT_MS = 5000
+# Contact-view URL templates ("/person/{id}/contact") learned from the search
+# form, one per site, so later lookups open the contact view directly
+CONTACT_ROUTES_FILE = os.path.join(SESSION_DIR, "contact_routes.json")
+# A deep link that has not shown the contact table by then is given up on
+DEEP_LINK_TIMEOUT_MS = 10000
+
+# Pages looking up IDs at the same time when the GUI runs a batch
+DEFAULT_CONCURRENCY = 4
+# Lookups started per second across all pages together, to stay polite to the server
+DEFAULT_RATE_PER_SECOND = 2.0
+
+# Lookups of one ID (first try included) before it is reported as failed
+MAX_LOOKUP_ATTEMPTS = 3
+# Retry n waits RETRY_BASE_DELAY * 2**(n-1) seconds, capped at RETRY_MAX_DELAY, half of it jittered
+RETRY_BASE_DELAY = 2.0
+RETRY_MAX_DELAY = 30.0
+
+# Lookup errors: retry later, give up on the ID, or stop the whole batch
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+FATAL = "fatal"
+# Playwright error messages that mean the page or network hiccupped
+TRANSIENT_ERROR_MARKERS = ("net::", "navigation", "timeout")
+# ... and ones that mean no page in this browser can be used any more
+FATAL_ERROR_MARKERS = ("has been closed", "browser has disconnected")
+
+class SessionExpired(Exception):
+    """The site bounced a lookup to the sign-in page; every later lookup would be too."""
+
+class RouteNotFound(Exception):
+    """A learned contact-view URL no longer leads to a contact table."""
+
+class RateLimiter:
     """
-    For each ID, logs in and scrapes up to 3 cell phone numbers from the Virtual Agent website.
-    Returns: {id: [cell1, cell2, ...], ...}
+    Global limiter shared by all pages: hands out start slots at most
+    rate_per_second apart, however many pages are waiting.
     """
-    results = {}
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+def classify_error(error: Exception) -> str:
+    """
+    TRANSIENT for timeouts and navigation/network errors, FATAL once the
+    page or browser is gone or the session has expired, PERMANENT for
+    anything else (which would fail the same way again).
+    """
+    if isinstance(error, SessionExpired):
+        return FATAL
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return TRANSIENT
+    message = str(error).lower()
+    if any(marker in message for marker in FATAL_ERROR_MARKERS):
+        return FATAL
+    if any(marker in message for marker in TRANSIENT_ERROR_MARKERS):
+        return TRANSIENT
+    return PERMANENT
+
+def normalize_phone_numbers(texts: List[str], limit: int = MAX_PHONE_NUMBERS) -> List[str]:
+    """
+    Cleans link texts into 0XXXXXXXXX numbers and returns the first `limit`
+    distinct valid ones, in table order. Texts that are not phone numbers
+    (names, e-mail addresses, "Edit") are dropped.
+    """
+    # One substitution over all texts; "|" is not noise, so it still separates them
+    cleaned = PHONE_NOISE.sub("", "|".join(texts)).split("|")
+    numbers = [text for text in cleaned if PHONE_NUMBER.fullmatch(text)]
+    return list(dict.fromkeys(numbers))[:limit]
+
+def retry_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Seconds to wait before retrying after failed attempt number `attempt` (1-based)."""
+    backoff = min(cap, base * 2 ** (attempt - 1))
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+_contact_routes: Optional[Dict[str, str]] = None
+# (site, template) deep links that failed in this process and are not learned again
+_broken_routes = set()
+
+def _routes() -> Dict[str, str]:
+    global _contact_routes
+    if _contact_routes is None:
         try:
-            # 1. Go to login page
-            page.goto("https://app.thevirtualagent.co.za/user/sign-in")
-            # 2. Fill in login form (update selectors as needed)
-            page.fill('input[name="username"]', username)
-            page.fill('input[name="password"]', password)
-            page.click('button[type="submit"]')
-            page.wait_for_load_state('networkidle')
-            # 3. Navigate to correct page (update as needed)
-            # Example: page.click('a[href="/search"]')
-            # 4. For each ID, fill in field, submit, scrape numbers
-            for id_value in ids:
-                # Fill in ID field (update selector as needed)
-                page.fill('input[name="id"]', id_value)
-                page.click('button[type="submit"]')
-                page.wait_for_load_state('networkidle')
-                # Scrape up to 3 phone numbers (update selector as needed)
-                numbers = page.eval_on_selector_all('td.phone', 'nodes => nodes.map(n => n.innerText)')
-                results[id_value] = numbers[:3]
-                time.sleep(0.5)  # Be polite to the server
-            browser.close()
+            with open(CONTACT_ROUTES_FILE, encoding="utf-8") as f:
+                _contact_routes = json.load(f)
+        except (OSError, ValueError):
+            _contact_routes = {}
+    return _contact_routes
+
+def _save_routes():
+    try:
+        os.makedirs(os.path.dirname(CONTACT_ROUTES_FILE), exist_ok=True)
+        with open(CONTACT_ROUTES_FILE, "w", encoding="utf-8") as f:
+            json.dump(_routes(), f, indent=2)
+    except OSError as e:
+        print(f"Could not save contact routes: {e}")
+
+def contact_route(base_url: str) -> Optional[str]:
+    """The learned contact-view URL template for a site, or None."""
+    return _routes().get(base_url)
+
+def learn_contact_route(base_url: str, url: str, id_value: str) -> Optional[str]:
+    """
+    Turns the URL a lookup of id_value ended on into a template by putting
+    {id} where the ID was, and remembers it for the site. URLs on another
+    site or without the ID in them teach nothing and return None.
+    """
+    if not url.startswith(base_url) or id_value not in url:
+        return None
+    template = url[len(base_url):].replace(id_value, "{id}")
+    if (base_url, template) in _broken_routes:
+        return None
+    if _routes().get(base_url) != template:
+        _routes()[base_url] = template
+        _save_routes()
+    return template
+
+def forget_contact_route(base_url: str):
+    """Drops a site's template after its deep link failed; it is not learned again by this process."""
+    template = _routes().pop(base_url, None)
+    if template is not None:
+        _broken_routes.add((base_url, template))
+        _save_routes()
+
+def contact_url(base_url: str, template: str, id_value: str) -> str:
+    return base_url + template.replace("{id}", id_value)
+
+def _host_in(host: str, hosts) -> bool:
+    return any(host == h or host.endswith("." + h) for h in hosts)
+
+def should_block(url: str, resource_type: str) -> bool:
+    """True for requests a lookup can do without: blocked resource types and hosts, unless the host is allowed."""
+    host = (urlparse(url).hostname or "").lower()
+    if _host_in(host, ALLOWED_HOSTS):
+        return False
+    return resource_type in BLOCKED_RESOURCE_TYPES or _host_in(host, BLOCKED_HOSTS)
+
+async def _route_request(route):
+    request = route.request
+    if should_block(request.url, request.resource_type):
+        REQUEST_STATS["blocked"] += 1
+        await route.abort()
+    else:
+        REQUEST_STATS["allowed"] += 1
+        await route.continue_()
+
+async def _new_context(browser, **kwargs):
+    # Routing turns off the browser's HTTP cache for the context, which the
+    # site's own scripts then pay for; BLOCK_REQUESTS = False skips it
+    context = await browser.new_context(**kwargs)
+    if BLOCK_REQUESTS:
+        await context.route("**/*", _route_request)
+    return context
+
+def session_path(session_key: str) -> str:
+    safe_key = re.sub(r"[^A-Za-z0-9_.-]", "_", session_key)
+    return os.path.join(SESSION_DIR, f"{safe_key}.json")
+
+async def _login(page, username: str, password: str, base_url: str):
+    # 1. Go to login page
+    await page.goto(base_url + SIGN_IN_PATH)
+    # 2. Fill in login form (update selectors as needed)
+    await page.fill('input[name="username"]', username)
+    await page.fill('input[name="password"]', password)
+    await page.click('button[type="submit"]')
+    await page.locator(SIGNED_IN_SELECTOR).wait_for(timeout=30000)
+
+async def _session_is_live(page, base_url: str) -> bool:
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+    # An expired session gets bounced to the sign-in page instead of the dashboard
+    await page.goto(base_url + SEARCH_PATH)
+    if SIGN_IN_PATH in page.url:
+        return False
+    try:
+        await page.locator(SIGNED_IN_SELECTOR).wait_for(timeout=SESSION_CHECK_TIMEOUT_MS)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+async def _signed_in_context(browser, username: str, password: str, base_url: str, state_path: str):
+    """
+    Returns (context, page) on the dashboard. Reuses the storage state saved
+    by the last run when it is still valid and only signs in again when it
+    has expired, saving the fresh state for next time.
+    """
+    if os.path.exists(state_path):
+        try:
+            context = await _new_context(browser, storage_state=state_path)
+            page = await context.new_page()
+            if await _session_is_live(page, base_url):
+                return context, page
+            await context.close()
         except Exception as e:
-            browser.close()
-            raise e
+            print(f"Ignoring unusable saved session {state_path}: {e}")
+    context = await _new_context(browser)
+    page = await context.new_page()
+    with metrics.timed(metrics.LOGIN):
+        await _login(page, username, password, base_url)
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    await context.storage_state(path=state_path)
+    return context, page
+
+async def _read_contact_table(page, timeout: float = LOOKUP_TIMEOUT_MS) -> List[str]:
+    links = await page.locator(CONTACT_TABLE_SELECTOR).evaluate(CONTACT_LINKS_JS, timeout=timeout)
+    return normalize_phone_numbers(links)
+
+def _check_signed_in(page):
+    if SIGN_IN_PATH in page.url:
+        raise SessionExpired("Session expired: redirected to sign-in")
+
+async def _lookup_by_search(page, id_value: str) -> List[str]:
+    # Fill in ID field (update selector as needed)
+    await page.fill('input[name="id"]', id_value)
+    # Wait for the results page and its contact table rather than for the
+    # network to go quiet, which also waits on beacons and late assets
+    async with page.expect_navigation(wait_until="domcontentloaded", timeout=LOOKUP_TIMEOUT_MS):
+        await page.click('button[type="submit"]')
+    _check_signed_in(page)
+    return await _read_contact_table(page)
+
+async def _lookup_by_link(page, url: str) -> List[str]:
+    """
+    Raises RouteNotFound only when the route itself is wrong: an HTTP 4xx
+    answer, or a page that finished loading without a contact table.
+    Timeouts and server errors are raised as they are.
+    """
+    response = await page.goto(url, wait_until="domcontentloaded", timeout=DEEP_LINK_TIMEOUT_MS)
+    _check_signed_in(page)
+    if response is not None and 400 <= response.status < 500 and response.status not in (408, 429):
+        raise RouteNotFound(f"Contact view returned HTTP {response.status}")
+    if response is not None and not response.ok:
+        raise ConnectionError(f"Contact view returned HTTP {response.status}")
+    try:
+        return await _read_contact_table(page, DEEP_LINK_TIMEOUT_MS)
+    except Exception as e:
+        if classify_error(e) != TRANSIENT:
+            raise
+        loaded = await page.evaluate("document.readyState") == "complete"
+        if loaded and await page.locator(CONTACT_TABLE_SELECTOR).count() == 0:
+            raise RouteNotFound("Contact view loaded without the contact table")
+        raise
+
+async def _lookup(page, id_value: str, base_url: str) -> List[str]:
+    """
+    One navigation straight to the contact view once its URL is known; the
+    search form otherwise, which also teaches the URL. A deep link shown to
+    be wrong is forgotten; any other deep-link failure (a slow page, a server
+    error) falls back to the form for this ID only.
+    """
+    template = contact_route(base_url)
+    if template:
+        try:
+            return await _lookup_by_link(page, contact_url(base_url, template, id_value))
+        except RouteNotFound as e:
+            print(f"Contact deep link no longer works ({e}); using the search form")
+            forget_contact_route(base_url)
+        except Exception as e:
+            if classify_error(e) == FATAL:
+                raise
+            print(f"Contact deep link failed for {id_value} ({e}); using the search form")
+        await page.goto(base_url + SEARCH_PATH, wait_until="domcontentloaded", timeout=LOOKUP_TIMEOUT_MS)
+    numbers = await _lookup_by_search(page, id_value)
+    learn_contact_route(base_url, page.url, id_value)
+    return numbers
+
+async def _reset_page(page, base_url: str):
+    # A timed-out lookup can leave the page half way through a navigation
+    try:
+        await page.goto(base_url + SEARCH_PATH)
+    except Exception as e:
+        print(f"Could not reload the search page: {e}")
+
+async def _lookup_all(pages: list, feed: AsyncIterator[List[str]], results: Dict[str, List[str]], limiter: RateLimiter,
+                      base_url: str,
+                      on_result: Optional[Callable[[str, List[str], bool], None]] = None,
+                      on_failure: Optional[Callable[[str, Exception], None]] = None,
+                      checkpoint: Optional[Callable[[], bool]] = None,
+                      max_attempts: int = MAX_LOOKUP_ATTEMPTS):
+    """
+    Looks up the IDs arriving from feed on all pages at once, storing
+    answers in results; pages start on the first IDs while feed is still
+    producing the rest. A lookup that fails transiently goes back to the
+    tail of the queue after a backoff (the page moves on to the next ID
+    meanwhile); after max_attempts tries, or on a permanent error, the ID is
+    handed to on_failure. A fatal error stops every page and is raised, as
+    is an error from feed.
+    """
+    queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    attempts = {}
+    queued = set()
+    unresolved = 0
+    fed = False
+    stopped = False
+
+    def stop():
+        nonlocal stopped
+        if not stopped:
+            stopped = True
+            for _ in pages:
+                queue.put_nowait(None)
+
+    def resolve():
+        nonlocal unresolved
+        unresolved -= 1
+        if unresolved == 0 and fed:
+            stop()
+
+    async def feeder():
+        nonlocal unresolved, fed
+        try:
+            async for ids in feed:
+                if stopped:
+                    return
+                for id_value in ids:
+                    if id_value not in queued and id_value not in results:
+                        queued.add(id_value)
+                        unresolved += 1
+                        queue.put_nowait(id_value)
+            fed = True
+            if unresolved == 0:
+                stop()
+        except BaseException:
+            stop()
+            raise
+
+    async def worker(page):
+        while True:
+            # Blocks while only retries are outstanding, or until feed brings more IDs
+            id_value = await queue.get()
+            if id_value is None or stopped:
+                return
+            # checkpoint() may block (job paused), so keep it off the event loop
+            if checkpoint and not await asyncio.to_thread(checkpoint):
+                stop()
+                return
+            await limiter.wait()
+            attempts[id_value] = attempts.get(id_value, 0) + 1
+            try:
+                with metrics.timed(metrics.ID_LOOKUP):
+                    numbers = await _lookup(page, id_value, base_url)
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == FATAL:
+                    stop()
+                    raise
+                if kind == TRANSIENT and attempts[id_value] < max_attempts:
+                    loop.call_later(retry_delay(attempts[id_value]), queue.put_nowait, id_value)
+                    await _reset_page(page, base_url)
+                    continue
+                if on_failure:
+                    on_failure(id_value, e)
+                resolve()
+                continue
+            results[id_value] = numbers
+            db.store_lookups({id_value: numbers})
+            if on_result:
+                on_result(id_value, numbers, False)
+            resolve()
+
+    feeding = asyncio.ensure_future(feeder())
+    workers = [asyncio.ensure_future(worker(page)) for page in pages]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        # After a fatal error the other pages must not carry on navigating
+        # (and spending credits) while it unwinds
+        pending = [task for task in workers + [feeding] if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    feeding.result()  # re-raises an error from feed
+
+def _answer_from_cache(ids: List[str], results: Dict[str, List[str]], cache_ttl_days: Optional[float],
+                       on_result: Optional[Callable[[str, List[str], bool], None]]) -> List[str]:
+    # Cache hits are answered straight away; returns the IDs still to look up
+    ids = [id_value for id_value in dict.fromkeys(ids) if id_value not in results]
+    cached = db.get_cached_lookups(ids, cache_ttl_days) if cache_ttl_days else {}
+    results.update(cached)
+    if on_result:
+        for id_value, numbers in cached.items():
+            on_result(id_value, numbers, True)
+    return [id_value for id_value in ids if id_value not in cached]
+
+async def scrape_phone_batches_async(batches: Iterable[List[str]], username: str, password: str,
+                                     concurrency: int = DEFAULT_CONCURRENCY,
+                                     rate_per_second: float = DEFAULT_RATE_PER_SECOND, base_url: str = BASE_URL,
+                                     on_result: Optional[Callable[[str, List[str], bool], None]] = None,
+                                     session_key: Optional[str] = None,
+                                     cache_ttl_days: Optional[float] = db.LOOKUP_CACHE_TTL_DAYS,
+                                     checkpoint: Optional[Callable[[], bool]] = None,
+                                     on_failure: Optional[Callable[[str, Exception], None]] = None,
+                                     max_attempts: int = MAX_LOOKUP_ATTEMPTS) -> Dict[str, List[str]]:
+    """
+    Signs in once (or reuses the session saved under session_key, which
+    defaults to the username), then looks IDs up on `concurrency` pages in parallel, each
+    in its own browser context seeded with the login session. Lookup starts
+    are spaced out by a shared RateLimiter.
+    IDs come from batches, which may be slow to produce (e.g. a generator
+    that parses reports as it goes): it is read on a thread of its own while
+    earlier IDs are looked up, and the one browser session serves them all.
+    The browser is only started once a batch holds an ID that is not in the
+    lookup cache.
+    IDs looked up within cache_ttl_days are answered from the local lookup
+    cache without touching the browser (None disables the cache).
+    on_result(id, numbers, from_cache) is called as each ID is answered.
+    Timeouts and navigation errors are retried with exponential backoff, up
+    to max_attempts lookups per ID; on_failure(id, error) is called for IDs
+    that still fail or fail permanently.
+    checkpoint() is called before every lookup; it may block (to pause the
+    run) and returning False stops the remaining lookups.
+    Returns: {id: [cell1, cell2, ...], ...} for the IDs that were answered.
+    """
+    results = {}
+    source = iter(batches)
+    loop = asyncio.get_running_loop()
+    # One thread, so whatever database connection the source opens can be closed with it
+    reader = ThreadPoolExecutor(max_workers=1)
+
+    async def next_to_fetch() -> Optional[List[str]]:
+        while True:
+            batch = await loop.run_in_executor(reader, next, source, None)
+            if batch is None:
+                return None
+            to_fetch = _answer_from_cache(batch, results, cache_ttl_days, on_result)
+            if to_fetch:
+                return to_fetch
+
+    try:
+        first = await next_to_fetch()
+        if first is None:
+            return results
+
+        async def feed():
+            yield first
+            while True:
+                to_fetch = await next_to_fetch()
+                if to_fetch is None:
+                    return
+                yield to_fetch
+
+        limiter = RateLimiter(rate_per_second)
+        # Imported here so Playwright only loads when a lookup needs the browser
+        from playwright.async_api import async_playwright
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            try:
+                state_path = session_path(session_key or username)
+                login_context, page = await _signed_in_context(browser, username, password, base_url, state_path)
+                # Every extra context starts from the same cookies/local storage,
+                # so the site sees one login but N independent tabs.
+                session = await login_context.storage_state()
+                pages = [page]
+                for _ in range(concurrency - 1):
+                    context = await _new_context(browser, storage_state=session)
+                    extra_page = await context.new_page()
+                    await extra_page.goto(base_url + SEARCH_PATH)
+                    pages.append(extra_page)
+                await _lookup_all(pages, feed(), results, limiter, base_url, on_result, on_failure, checkpoint, max_attempts)
+            finally:
+                await browser.close()
+                metrics.flush()
+    finally:
+        reader.submit(db.close_conn)
+        await asyncio.to_thread(reader.shutdown)
     return results
+
+async def scrape_phones_async(ids: List[str], username: str, password: str, concurrency: int = DEFAULT_CONCURRENCY,
+                              rate_per_second: float = DEFAULT_RATE_PER_SECOND, base_url: str = BASE_URL,
+                              on_result: Optional[Callable[[str, List[str], bool], None]] = None,
+                              session_key: Optional[str] = None,
+                              cache_ttl_days: Optional[float] = db.LOOKUP_CACHE_TTL_DAYS,
+                              checkpoint: Optional[Callable[[], bool]] = None,
+                              on_failure: Optional[Callable[[str, Exception], None]] = None,
+                              max_attempts: int = MAX_LOOKUP_ATTEMPTS) -> Dict[str, List[str]]:
+    """
+    scrape_phone_batches_async for a list of IDs known up front.
+    Returns: {id: [cell1, cell2, ...], ...} in the order the IDs were given,
+    for the IDs that were answered.
+    """
+    ids = list(dict.fromkeys(ids))
+    results = await scrape_phone_batches_async([ids], username, password, max(min(concurrency, len(ids)), 1),
+                                               rate_per_second, base_url, on_result, session_key, cache_ttl_days,
+                                               checkpoint, on_failure, max_attempts)
+    return {id_value: results[id_value] for id_value in ids if id_value in results}
+
+def scrape_phones_for_ids(ids: List[str], username: str, password: str, concurrency: int = 1,
+                          rate_per_second: float = DEFAULT_RATE_PER_SECOND, base_url: str = BASE_URL,
+                          on_result: Optional[Callable[[str, List[str], bool], None]] = None,
+                          session_key: Optional[str] = None,
+                          cache_ttl_days: Optional[float] = db.LOOKUP_CACHE_TTL_DAYS,
+                          checkpoint: Optional[Callable[[], bool]] = None,
+                          on_failure: Optional[Callable[[str, Exception], None]] = None,
+                          max_attempts: int = MAX_LOOKUP_ATTEMPTS) -> Dict[str, List[str]]:
+    """
+    For each ID, scrapes up to 3 cell phone numbers from the Virtual Agent website.
+    Logs in once (or not at all while the saved session is valid); with
+    concurrency > 1 several pages look IDs up in parallel. Recently looked-up
+    IDs come from the local lookup cache; lookups that time out are retried
+    later in the run.
+    Returns: {id: [cell1, cell2, ...], ...}
+    """
+    return asyncio.run(scrape_phones_async(ids, username, password, concurrency, rate_per_second, base_url, on_result,
+                                           session_key, cache_ttl_days, checkpoint, on_failure, max_attempts))
+
+def scrape_phone_batches(batches: Iterable[List[str]], username: str, password: str, concurrency: int = 1,
+                         rate_per_second: float = DEFAULT_RATE_PER_SECOND, base_url: str = BASE_URL,
+                         on_result: Optional[Callable[[str, List[str], bool], None]] = None,
+                         session_key: Optional[str] = None,
+                         cache_ttl_days: Optional[float] = db.LOOKUP_CACHE_TTL_DAYS,
+                         checkpoint: Optional[Callable[[], bool]] = None,
+                         on_failure: Optional[Callable[[str, Exception], None]] = None,
+                         max_attempts: int = MAX_LOOKUP_ATTEMPTS) -> Dict[str, List[str]]:
+    """
+    Like scrape_phones_for_ids, for IDs that arrive in batches while
+    earlier ones are being looked up, all in one browser session.
+    Returns: {id: [cell1, cell2, ...], ...}
+    """
+    return asyncio.run(scrape_phone_batches_async(batches, username, password, concurrency, rate_per_second, base_url,
+                                                  on_result, session_key, cache_ttl_days, checkpoint, on_failure,
+                                                  max_attempts))